@@ -4,19 +4,46 @@ import logging
 import random
 import re
 import json
+import queue
+import shutil
 import sqlite3
+import signal
+import threading
+from collections import OrderedDict, deque
 from datetime import datetime, timedelta
+STARTUP_STARTED = time.time()  # Pentru raportul de pornire (include importurile de mai jos)
 import telebot
 from telebot import types
-from threading import Lock
-from urllib.parse import urlparse, unquote
-from env_loader import TELEGRAM_TOKEN, CHAT_IDS, ADMIN_IDS, DB_FILE, URLS_FILE
+from threading import Lock, BoundedSemaphore
+from urllib.parse import urlparse, unquote, parse_qsl, urlencode
+from env_loader import TELEGRAM_TOKEN, CHAT_IDS, ADMIN_IDS, USER_IDS, DB_FILE, URLS_FILE, PROXIES
+from env_loader import WEBHOOK_URL, WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_SECRET, TELEGRAM_API_URL
 
 lock = Lock()  # Pentru siguranța thread-urilor
+# Abonamente: căutare -> chat-urile interesate (indexul folosit la fan-out)
+SUBSCRIPTIONS = {}  # url -> [chat_id, ...]
+SUBSCRIPTIONS_LOADED = False
+subscriptions_lock = Lock()
 # Cache pentru data publicării
 PUBLICATION_DATE_CACHE = {}  # ad_id -> {date_str, minutes_ago, last_check_time}
 MAX_CACHE_SIZE = 1000
 CACHE_EXPIRY_HOURS = 6
+# Cache LRU pentru imagini: URL OLX -> file_id Telegram (Telegram descarcă imaginea o singură dată)
+MEDIA_FILE_ID_CACHE = OrderedDict()
+MAX_MEDIA_CACHE_SIZE = 500
+IMAGE_SEND_TIMEOUT = 8        # Secunde pentru primul send_photo cu URL; peste atât trimitem doar text
+IMAGE_FAILED = ''             # Marcaj în cache: Telegram a refuzat imaginea, mergem direct pe text
+IMAGE_SLOW_SECONDS = 120      # Cât timp o imagine care a dat timeout merge direct pe text (restul fan-out-ului)
+IMAGE_FETCH_ERRORS = ('failed to get http url content', 'wrong file identifier', 'wrong type of the web page content')
+SLOW_IMAGE_URLS = {}          # image_url -> până când o tratăm ca lentă
+media_cache_lock = Lock()
+# Digest: anunțurile care nu sunt ultra-fresh se adună per chat și pleacă într-un singur mesaj
+DIGEST_INTERVAL_SECONDS = 10  # Cât stă maxim un anunț în coadă
+DIGEST_MAX_ITEMS = 10         # Un digest (și un media group Telegram) are maxim 10 anunțuri
+DIGEST_AS_MEDIA_GROUP = False # True = album cu poze în loc de listă text
+DIGEST_QUEUES = {}  # chat_id -> [{'ad', 'minutes_ago', 'queued_at'}, ...]
+digest_condition = threading.Condition()
+digest_worker_started = False
 
 # SETĂRI SCANARE - Optimizate pentru GPU Flipping (Viteză maximă)
 QUICK_CHECK_INTERVAL = 10     # 10 secunde între verificări
@@ -27,37 +54,153 @@ VERY_FRESH_AD_MINUTES = 3     # Notificare prioritară pentru anunțuri sub 3 mi
 SKIP_FIRST_N_ADS = 2          # Ignoră primele 2 (Promovate/Ad-uri)
 MAX_CARDS_TO_CHECK = 12       # Verificăm doar prima parte a paginii (cele mai noi)
 SCROLL_COUNT = 2              # 2 scroll-uri sunt destule pentru OLX.ro desktop
-MAX_PARALLEL_URLS = 4         # Putem verifica mai multe căutări deodată
+MAX_PARALLEL_URLS = 4         # Putem verifica mai multe căutări deodată (punctul de plecare al auto-tuning-ului)
 PAGE_LOAD_TIMEOUT = 25        
 DETAILED_LOGGING = True       
 CONSECUTIVE_OLD_COUNT = 2     # Dacă găsim 2 vechi, tăiem scanarea (economisim timp)
 EARLY_EXIT_ON_OLD = True      
-
-def check_ad_sent(link):
-    """Verifică în DB dacă anunțul a fost deja trimis pe Telegram."""
-    try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        cursor.execute("SELECT sent_to_telegram FROM ads WHERE link = ?", (link,))
-        result = cursor.fetchone()
-        conn.close()
-        return bool(result[0]) if result and result[0] is not None else False
-    except Exception as e:
-        logging.error(f"Eroare check_ad_sent: {e}")
-        return False
-
-def mark_ad_as_sent(link):
-    """Marchează anunțul ca trimis în baza de date."""
+STREAMING_SCAN = True         # Procesăm cardurile pe măsură ce apar în DOM, fără să așteptăm pagina întreagă
+STREAM_POLL_SECONDS = 0.25    # Cât de des citim DOM-ul după carduri noi
+STREAM_IDLE_POLLS = 3         # Citiri fără carduri noi după care facem scroll (sau ne oprim)
+SEARCH_WATERMARKS = {}        # url -> ad_id-ul celui mai nou anunț văzut la scanarea anterioară
+FIRST_ALERT_SECONDS = deque(maxlen=50)  # Request pagină -> prima alertă livrată, pe ultimele scanări
+
+# SETĂRI BACKFILL - recuperăm anunțurile apărute cât timp botul a fost oprit
+BACKFILL_GAP_MINUTES = 5          # Pauză (față de ultima scanare reușită) care declanșează backfill
+BACKFILL_MAX_AGE_MINUTES = 12 * 60  # Limita de vechime relaxată nu trece de 12 ore
+BACKFILL_MAX_PAGES = 5            # Câte pagini (?page=N) parcurgem maxim per căutare
+BACKFILL_PARALLEL_PAGES = 2       # Pagini încărcate simultan pentru aceeași căutare
+BACKFILL_MAX_BROWSERS = 4         # Buget global de browsere pentru backfill (toate căutările)
+backfill_slots = BoundedSemaphore(BACKFILL_MAX_BROWSERS)
+
+# SETĂRI DEADLINE / WATCHDOG - un browser blocat nu are voie să țină pe loc tot ciclul
+SCAN_DEADLINE_SECONDS = PAGE_LOAD_TIMEOUT + 35  # Timp maxim de viață pentru o sesiune de browser
+CYCLE_DEADLINE_SECONDS = 90   # Cât așteaptă ciclul după scanări înainte să meargă mai departe
+WATCHDOG_INTERVAL = 5         # Cât de des verifică watchdog-ul browserele active
+WATCHDOG_GRACE_SECONDS = 10   # Cât lăsăm scanarea să se oprească singură înainte să omorâm Chrome
+CIRCUIT_FAILURE_THRESHOLD = 3  # Eșecuri consecutive după care parcăm căutarea
+CIRCUIT_OPEN_SECONDS = 300    # Prima parcare durează 5 minute, apoi se dublează
+CIRCUIT_MAX_OPEN_SECONDS = 3600
+
+class ScanTimeout(Exception):
+    """Scanarea a depășit SCAN_DEADLINE_SECONDS."""
+
+ACTIVE_BROWSERS = {}  # id sesiune -> {'driver', 'label', 'deadline', 'killed'}
+active_browsers_lock = Lock()
+IN_FLIGHT_URLS = set()  # Căutări încă în lucru (posibil din ciclul anterior)
+BACKFILLING_URLS = set()  # Subset din IN_FLIGHT_URLS: căutări în backfill (lung prin natura lui)
+URL_HEALTH = {}  # url -> {'failures', 'trips', 'open_until'}
+url_health_lock = Lock()
+scan_context = threading.local()
+watchdog_started = False
+
+# SETĂRI ANTI-BLOCARE - debit constant în loc de rafale care aduc captcha
+HOST_REQUESTS_PER_MINUTE = 20  # Buget global de încărcări de pagină per host (olx.ro)
+HOST_BURST = MAX_PARALLEL_URLS  # Câte request-uri pot pleca deodată după o pauză
+BLOCK_BACKOFF_SECONDS = 60    # Prima pauză după o pagină de blocare/captcha, apoi se dublează
+BLOCK_BACKOFF_MAX_SECONDS = 1800
+PROXY_COOLDOWN_SECONDS = 300  # Un proxy blocat stă pe bară cel puțin atât
+USER_AGENT_PROFILES = [
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36",
+]
+BLOCK_PAGE_MARKERS = ['captcha', 'access denied', 'request unsuccessful', '403 forbidden', 'too many requests', 'cf-chl']
+
+HOST_BUDGETS = {}  # host -> {'tokens', 'updated', 'blocked_until', 'block_streak'}
+PROXY_HEALTH = {}  # proxy (None = direct) -> {'score', 'cooldown_until', 'blocks'}
+governor_lock = Lock()
+
+# SETĂRI AUTO-TUNING (AIMD) - numărul de browsere paralele se ajustează după cum răspunde host-ul
+MIN_PARALLEL_URLS = 1
+TARGET_SCAN_SECONDS = 20      # p90 al duratei unei scanări peste care reducem paralelismul
+# Cât poate servi bugetul host-ului: browserele în plus doar ar aștepta jetoane (20/min, 20s -> 6)
+HOST_WORKER_CAP = max(HOST_BURST, int(HOST_REQUESTS_PER_MINUTE * TARGET_SCAN_SECONDS / 60))
+MAX_PARALLEL_URLS_LIMIT = max(2, min((os.cpu_count() or 2) * 2, HOST_WORKER_CAP))  # 2-core VPS: 4, 8-core: 6
+MAX_SCAN_ERROR_RATE = 0.25    # Eșecuri/blocări peste 25% într-un ciclu = reducem
+MAX_LOAD_PER_CORE = 1.5       # Load average / nuclee peste care CPU-ul e considerat saturat
+BROWSER_MEMORY_MB = 250       # Cât consumă aproximativ un Chromium headless
+MIN_FREE_MEMORY_MB = 300      # Rezervă de memorie sub care nu pornim browsere în plus
+SCAN_TUNING = {
+    'workers': min(MAX_PARALLEL_URLS, MAX_PARALLEL_URLS_LIMIT),
+    'last_decision': 'pornire',
+    'last_update': None,
+    'metrics': {},
+}
+CYCLE_SAMPLES = []  # (durată sau None, succes, blocat) pentru scanările din ciclul curent
+tuning_lock = Lock()
+
+# SETĂRI PROFILURI BROWSER - cache-ul HTTP și consimțământul cookies rămân între scanări
+PROFILES_DIR = './profiles'
+PROFILE_SLOT_COUNT = MAX_PARALLEL_URLS_LIMIT + BACKFILL_MAX_BROWSERS + 1  # + încălzirea de la pornire
+PROFILE_BASE_PORT = 9400      # Fiecare profil are portul lui de debug (browserele nu se amestecă)
+PROFILE_DISK_CACHE_MB = 200   # Bundle-urile JS/CSS ale OLX încap lejer
+PROFILE_MAX_AGE_HOURS = 24    # Profilurile se recreează zilnic (cookies/fingerprint proaspete)
+PROFILE_WAIT_SECONDS = 5      # Cât așteptăm un profil liber înainte să pornim cu unul temporar
+PROFILE_CREATED_MARKER = '.created'
+PROFILE_CONSENT_MARKER = '.olx_consent'
+PROFILE_SLOTS = queue.LifoQueue()  # LIFO: profilurile folosite recent au cache-ul cel mai cald
+for profile_slot in range(PROFILE_SLOT_COUNT):
+    PROFILE_SLOTS.put(profile_slot)
+
+# SETĂRI PORNIRE
+STARTUP_TIMINGS = {}  # fază -> secunde, pentru raportul de pornire
+startup_lock = Lock()
+WARM_DB_ROWS = 500            # Câte rânduri recente citim ca să încălzim cache-ul SQLite
+STARTUP_REPORT_WAIT_SECONDS = 120  # Cât așteptăm fazele din fundal pentru raportul final de pornire
+
+# SETĂRI BOT TELEGRAM
+BOT_WORKER_THREADS = 4        # Thread-uri care rulează handlerele de comenzi (webhook și polling)
+POLLING_TIMEOUT = 30          # Long polling: Telegram ține cererea deschisă până apare un update
+WEBHOOK_MAX_BODY = 1024 * 1024  # Update-urile Telegram sunt mici; refuzăm corpuri suspecte
+
+def mark_ad_as_sent(link, chat_ids=None):
+    """Marchează anunțul ca trimis în baza de date (și livrarea către fiecare chat)."""
     try:
         conn = sqlite3.connect(DB_FILE)
         cursor = conn.cursor()
         cursor.execute("UPDATE ads SET sent_to_telegram = 1 WHERE link = ?", (link,))
+        if chat_ids:
+            now = datetime.now().isoformat()
+            cursor.executemany(
+                "INSERT OR IGNORE INTO ad_deliveries (link, chat_id, sent_at) VALUES (?, ?, ?)",
+                [(link, chat_id, now) for chat_id in chat_ids]
+            )
         conn.commit()
         conn.close()
         return True
     except Exception as e:
         logging.error(f"Eroare mark_ad_as_sent: {e}")
         return False
+
+def claim_ad_deliveries(link, chat_ids):
+    """Rezervă livrarea anunțului către chat-uri; întoarce doar chat-urile rezervate acum (None la eroare DB).
+
+    INSERT OR IGNORE pe (link, chat_id) e atomic: două scanări care găsesc același anunț
+    prin căutări suprapuse nu pot rezerva amândouă același chat.
+    """
+    if not chat_ids:
+        return []
+    try:
+        with lock:
+            conn = sqlite3.connect(DB_FILE)
+            cursor = conn.cursor()
+            now = datetime.now().isoformat()
+            claimed = []
+            for chat_id in chat_ids:
+                cursor.execute(
+                    "INSERT OR IGNORE INTO ad_deliveries (link, chat_id, sent_at) VALUES (?, ?, ?)",
+                    (link, chat_id, now)
+                )
+                if cursor.rowcount:
+                    claimed.append(chat_id)
+            conn.commit()
+            conn.close()
+        return claimed
+    except Exception as e:
+        logging.error(f"Eroare claim_ad_deliveries: {e}")
+        return None
     
 def process_unsent_ads():
     """Trimite anunțurile care sunt în DB dar nu au ajuns pe Telegram (restanțe)."""
@@ -70,6 +213,9 @@ def process_unsent_ads():
         # Verificăm dacă mai este "fresh" (să nu trimitem ceva de acum 3 zile)
         minutes_ago = get_cached_ad_age(ad.get('ad_id'), ad.get('publication_date', ''))
         if minutes_ago <= MAX_AD_AGE_MINUTES * 1.5:
+            ad['chat_ids'] = claim_ad_deliveries(ad['link'], get_chats_for_url(ad.get('search_url')))
+            if ad['chat_ids'] is None:
+                continue # Eroare DB: reîncercăm la ciclul următor
             if send_to_telegram(ad):
                 sent_count += 1
         else:
@@ -97,8 +243,12 @@ def extract_date_from_preview(element):
             continue
     return None
 
-def add_ad_to_db(link, title, site="OLX.ro", ad_id=None, date_published=None):
-    """Adaugă un anunț nou în baza de date. Returnează True dacă a fost adăugat."""
+def add_ad_to_db(link, title, site="OLX.ro", ad_id=None, date_published=None, search_url=None):
+    """Adaugă un anunț nou în baza de date. Returnează (adăugat, link-ul din DB).
+
+    Link-ul din DB poate diferi de cel primit când același ad_id e deja salvat sub alt link
+    (parametri de tracking); livrările se urmăresc sub link-ul salvat. None la eroare DB.
+    """
     now = datetime.now()
     expiry = now + timedelta(days=7) # Anunțul expiră în DB după 7 zile
 
@@ -106,92 +256,411 @@ def add_ad_to_db(link, title, site="OLX.ro", ad_id=None, date_published=None):
         conn = sqlite3.connect(DB_FILE)
         cursor = conn.cursor()
 
-        # Verificăm dacă există deja
-        cursor.execute("SELECT sent_to_telegram FROM ads WHERE link = ?", (link,))
+        # Verificăm dacă există deja (după link sau, pentru link-uri cu tracking, după ad_id)
+        cursor.execute(
+            "SELECT link FROM ads WHERE link = ? UNION ALL SELECT link FROM ads WHERE ad_id = ?",
+            (link, ad_id)
+        )
         result = cursor.fetchone()
         
         if result is not None:
             # Dacă există, doar îi prelungim viața în DB
-            cursor.execute("UPDATE ads SET expiry_date = ? WHERE link = ?", (expiry.isoformat(), link))
+            cursor.execute("UPDATE ads SET expiry_date = ? WHERE link = ?", (expiry.isoformat(), result[0]))
             conn.commit()
             conn.close()
-            return False, bool(result[0])
+            return False, result[0]
         
         # Inserăm anunț nou
         cursor.execute(
             '''
             INSERT INTO ads 
-            (link, title, ad_id, site, date_found, date_published, expiry_date, sent_to_telegram)
-            VALUES (?, ?, ?, ?, ?, ?, ?, 0)
+            (link, title, ad_id, site, search_url, date_found, date_published, expiry_date, sent_to_telegram)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0)
             ''',
-            (link, title, ad_id, site, now.isoformat(), date_published, expiry.isoformat())
+            (link, title, ad_id, site, search_url, now.isoformat(), date_published, expiry.isoformat())
         )
         conn.commit()
         conn.close()
-        return True, False 
+        return True, link
 
     except Exception as e:
         logging.error(f"❌ Eroare DB la adăugare: {e}")
-        return False, False
+        return False, None
+
+def get_scan_gap_minutes(url):
+    """Minute de la ultima scanare reușită a căutării (None dacă nu a fost scanată niciodată)."""
+    try:
+        conn = sqlite3.connect(DB_FILE)
+        cursor = conn.cursor()
+        cursor.execute("SELECT value FROM settings WHERE key = ?", (f"last_scan:{url}",))
+        result = cursor.fetchone()
+        conn.close()
+        if not result:
+            return None
+        return (datetime.now() - datetime.fromisoformat(result[0])).total_seconds() / 60
+    except Exception as e:
+        logging.error(f"Eroare get_scan_gap_minutes: {e}")
+        return None
+
+def set_last_scan_time(url):
+    """Salvează momentul ultimei scanări reușite pentru o căutare."""
+    try:
+        now = datetime.now().isoformat()
+        conn = sqlite3.connect(DB_FILE)
+        cursor = conn.cursor()
+        cursor.execute(
+            "INSERT OR REPLACE INTO settings (key, value, updated_at) VALUES (?, ?, ?)",
+            (f"last_scan:{url}", now, now)
+        )
+        conn.commit()
+        conn.close()
+        return True
+    except Exception as e:
+        logging.error(f"Eroare set_last_scan_time: {e}")
+        return False
 
 def get_ad_stats():
-    """Generează statisticile pentru comanda /dbstats."""
+    """Generează statisticile pentru comanda /dbstats (contoare materializate, fără scanări)."""
     try:
         conn = sqlite3.connect(DB_FILE)
         cursor = conn.cursor()
         stats = {}
         
-        cursor.execute("SELECT COUNT(*) FROM ads")
-        stats['total_ads'] = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT site, COUNT(*) FROM ads GROUP BY site")
-        stats['by_site'] = {site: count for site, count in cursor.fetchall()}
-        
-        yesterday = (datetime.now() - timedelta(days=1)).isoformat()
-        cursor.execute("SELECT COUNT(*) FROM ads WHERE date_found > ?", (yesterday,))
-        stats['last_24h'] = cursor.fetchone()[0]
+        counters = dict(cursor.execute("SELECT name, value FROM ad_counters").fetchall())
+        stats['total_ads'] = counters.get('total', 0)
+        stats['unsent_ads'] = counters.get('unsent', 0)
+        stats['by_site'] = {name[5:]: value for name, value in counters.items() if name.startswith('site:') and value}
         
-        cursor.execute("SELECT value FROM settings WHERE key = 'last_cleanup'")
-        res = cursor.fetchone()
-        stats['last_cleanup'] = res[0] if res else "Niciodată"
+        # Orele complete din ultimele 24h vin din ad_hourly; ora de la marginea ferestrei
+        # se numără exact pe indexul date_found (cel mult o oră de anunțuri)
+        yesterday = datetime.now() - timedelta(days=1)
+        boundary_hour = yesterday.strftime('%Y-%m-%dT%H')
+        next_hour = (yesterday.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)).isoformat()
+        cursor.execute(
+            '''
+            SELECT
+                (SELECT IFNULL(SUM(count), 0) FROM ad_hourly WHERE hour > ?),
+                (SELECT COUNT(*) FROM ads WHERE date_found > ? AND date_found < ?),
+                (SELECT value FROM settings WHERE key = 'last_cleanup')
+            ''',
+            (boundary_hour, yesterday.isoformat(), next_hour)
+        )
+        full_hours, boundary_count, last_cleanup = cursor.fetchone()
+        stats['last_24h'] = full_hours + boundary_count
+        stats['last_cleanup'] = last_cleanup or "Niciodată"
         
         cursor.execute("SELECT title, date_found FROM ads ORDER BY date_found DESC LIMIT 3")
         stats['recent_ads'] = [{'title': r[0], 'date': r[1]} for r in cursor.fetchall()]
         
-        cursor.execute("SELECT COUNT(*) FROM ads WHERE sent_to_telegram = 0")
-        stats['unsent_ads'] = cursor.fetchone()[0]
-        
         conn.close()
         return stats
     except Exception as e:
         logging.error(f"Eroare statistici: {e}")
         return {'total_ads': 0, 'last_cleanup': 'Eroare'}
 
-def quick_check_url(url, options=None):
-    """Funcția de worker pentru thread-uri: deschide browser, scanează, închide browser."""
+def run_in_browser(task, label, options=None, request_url=None):
+    """Deschide un browser nou, rulează task(driver) și închide browserul.
+
+    Cu request_url, jetonul din bugetul host-ului se ia înainte să pornească Chromium:
+    un browser nu stă degeaba cât așteptăm bugetul sau trece backoff-ul după o blocare.
+    Sesiunea are un termen limită (numărat de la pornirea browserului): scanarea se oprește
+    singură (ScanTimeout), iar dacă rămâne blocată în Chrome, watchdog-ul omoară procesul.
+    Returnează None la eșec.
+    """
+    scan_context.request_started = None
+    if request_url and not acquire_request_slot(request_url):
+        logging.warning(f"⏳ Fără buget de request-uri pentru {label} în {SCAN_DEADLINE_SECONDS}s, sar peste.")
+        return None
+    # Durata scanării (pentru auto-tuning) nu include așteptarea jetonului
+    scan_context.request_started = time.time()
+
     driver = None
+    session_id = object()
+    deadline = time.time() + SCAN_DEADLINE_SECONDS
+    scan_context.deadline = deadline
+    with active_browsers_lock:
+        ACTIVE_BROWSERS[session_id] = {'driver': None, 'label': label, 'deadline': deadline, 'killed': False}
+    scan_context.profile = None
+    profile_dir = None
     try:
         if options is None:
-            options = create_browser_options()
+            # Fiecare sesiune primește un profil persistent și un proxy ales după sănătate
+            profile_dir = acquire_profile_dir()
+            scan_context.profile = choose_browser_profile(profile_dir)
+            options = create_browser_options(scan_context.profile)
         
         # Creăm o instanță nouă de browser pentru fiecare thread
+        load_browser_classes()
         driver = ChromiumPage(addr_or_opts=options)
-        
-        # Pornim scanarea efectivă a paginii
-        fresh_ads_found = quick_check_ads(url, driver)
-        
-        return fresh_ads_found
+        with active_browsers_lock:
+            ACTIVE_BROWSERS[session_id]['driver'] = driver
+        return task(driver)
+    except ScanTimeout:
+        logging.warning(f"⌛ Scanarea pentru {label} a depășit {SCAN_DEADLINE_SECONDS}s și a fost oprită.")
+        return None
     except Exception as e:
-        logging.error(f"Eroare critică în thread-ul pentru {url}: {e}")
-        return False
+        with active_browsers_lock:
+            killed = ACTIVE_BROWSERS[session_id]['killed']
+        if killed:
+            logging.warning(f"⌛ Browserul pentru {label} a fost omorât de watchdog.")
+        else:
+            logging.error(f"Eroare critică în thread-ul pentru {label}: {e}")
+        return None
     finally:
-        if driver:
+        scan_context.deadline = None
+        with active_browsers_lock:
+            entry = ACTIVE_BROWSERS.pop(session_id, None)
+        if driver and not (entry and entry['killed']):
             try:
                 driver.quit() # Foarte important să închidem procesele Chrome
-            except: pass
+            except Exception as e:
+                logging.warning(f"Nu am putut închide browserul pentru {label}: {e}")
+        if profile_dir:
+            # Un Chrome omorât poate lăsa profilul corupt
+            if entry and entry['killed']:
+                profile_dir['rotate'] = True
+            release_profile_dir(profile_dir)
+
+def get_profile_path(slot):
+    return os.path.join(PROFILES_DIR, f"worker_{slot}")
+
+def acquire_profile_dir():
+    """Ia un profil persistent liber (None dacă toate sunt ocupate: browserul pornește cu profil temporar)."""
+    try:
+        slot = PROFILE_SLOTS.get(timeout=PROFILE_WAIT_SECONDS)
+    except queue.Empty:
+        logging.warning("Niciun profil de browser liber, folosesc unul temporar.")
+        return None
+
+    path = get_profile_path(slot)
+    created_marker = os.path.join(path, PROFILE_CREATED_MARKER)
+    try:
+        if os.path.exists(created_marker) and time.time() - os.path.getmtime(created_marker) > PROFILE_MAX_AGE_HOURS * 3600:
+            logging.info(f"♻️ Profilul {slot} a expirat, îl recreez.")
+            shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path, exist_ok=True)
+        if not os.path.exists(created_marker):
+            with open(created_marker, 'w') as f:
+                f.write(datetime.now().isoformat())
+        # Un Chrome omorât lasă lock-urile în profil, iar următorul browser ar refuza să pornească
+        for lock_name in ('SingletonLock', 'SingletonSocket', 'SingletonCookie'):
+            lock_path = os.path.join(path, lock_name)
+            if os.path.lexists(lock_path):
+                os.remove(lock_path)
+    except OSError as e:
+        logging.warning(f"Problemă la pregătirea profilului {slot}: {e}")
+
+    return {
+        'slot': slot,
+        'path': path,
+        'port': PROFILE_BASE_PORT + slot,
+        'consented': os.path.exists(os.path.join(path, PROFILE_CONSENT_MARKER)),
+        'rotate': False,
+    }
+
+def release_profile_dir(profile_dir):
+    """Eliberează profilul; cele marcate pentru rotație (blocate/corupte) se șterg."""
+    if profile_dir['rotate']:
+        logging.info(f"♻️ Rotez profilul {profile_dir['slot']}.")
+        shutil.rmtree(profile_dir['path'], ignore_errors=True)
+    PROFILE_SLOTS.put(profile_dir['slot'])
+
+def mark_profile_consented(profile_dir):
+    """Notează că profilul are deja consimțământul OLX (cookie-urile rămân în profil)."""
+    try:
+        with open(os.path.join(profile_dir['path'], PROFILE_CONSENT_MARKER), 'w') as f:
+            f.write(datetime.now().isoformat())
+        profile_dir['consented'] = True
+    except OSError as e:
+        logging.debug(f"mark_profile_consented: {e}")
+
+def cleanup_profiles():
+    """Șterge profilurile orfane (sloturi care nu mai există, directoare vechi)."""
+    os.makedirs(PROFILES_DIR, exist_ok=True)
+    valid = {f"worker_{slot}" for slot in range(PROFILE_SLOT_COUNT)}
+    for name in os.listdir(PROFILES_DIR):
+        if name not in valid:
+            shutil.rmtree(os.path.join(PROFILES_DIR, name), ignore_errors=True)
+
+def check_scan_deadline():
+    """Oprește scanarea curentă dacă a depășit termenul limită (anulare cooperativă)."""
+    deadline = getattr(scan_context, 'deadline', None)
+    if deadline and time.time() > deadline:
+        raise ScanTimeout()
+
+def kill_browser(driver, label):
+    """Omoară procesul Chrome al unei sesiuni blocate."""
+    pid = None
+    try:
+        pid = driver.process_id
+    except Exception:
+        pass
+
+    if pid:
+        try:
+            os.kill(pid, signal.SIGKILL if hasattr(signal, 'SIGKILL') else signal.SIGTERM)
+            logging.warning(f"🪓 Watchdog: am omorât Chrome (pid {pid}) pentru {label}")
+            return
+        except Exception as e:
+            logging.warning(f"Watchdog: kill pid {pid} eșuat: {e}")
+
+    # Fără pid: încercăm quit forțat într-un thread separat, ca watchdog-ul să nu se blocheze
+    threading.Thread(target=lambda: driver.quit(force=True), daemon=True).start()
+    logging.warning(f"🪓 Watchdog: quit forțat pentru browserul {label}")
+
+def browser_watchdog():
+    """Thread care omoară browserele rămase blocate după termenul limită."""
+    while True:
+        time.sleep(WATCHDOG_INTERVAL)
+        try:
+            now = time.time()
+            with active_browsers_lock:
+                hung = [
+                    entry for entry in ACTIVE_BROWSERS.values()
+                    if entry['driver'] and not entry['killed'] and now > entry['deadline'] + WATCHDOG_GRACE_SECONDS
+                ]
+                for entry in hung:
+                    entry['killed'] = True
+            for entry in hung:
+                kill_browser(entry['driver'], entry['label'])
+        except Exception as e:
+            logging.error(f"Eroare watchdog: {e}")
+
+def start_browser_watchdog():
+    """Pornește watchdog-ul o singură dată."""
+    global watchdog_started
+    with active_browsers_lock:
+        if watchdog_started:
+            return
+        watchdog_started = True
+    threading.Thread(target=browser_watchdog, daemon=True).start()
+
+def is_circuit_open(url):
+    """True dacă căutarea e parcată temporar după prea multe eșecuri."""
+    with url_health_lock:
+        health = URL_HEALTH.get(url)
+        return bool(health and health['open_until'] > time.time())
+
+def record_scan_result(url, success):
+    """Actualizează contorul de eșecuri și deschide circuitul când e cazul."""
+    with url_health_lock:
+        health = URL_HEALTH.setdefault(url, {'failures': 0, 'trips': 0, 'open_until': 0})
+        if success:
+            if health['trips']:
+                logging.info(f"✅ Căutarea funcționează din nou: {url}")
+            health.update(failures=0, trips=0, open_until=0)
+            return
+
+        health['failures'] += 1
+        # După o parcare, un singur eșec la reluare e suficient ca să parcăm din nou
+        if health['failures'] >= CIRCUIT_FAILURE_THRESHOLD or health['trips']:
+            open_seconds = min(CIRCUIT_OPEN_SECONDS * 2 ** health['trips'], CIRCUIT_MAX_OPEN_SECONDS)
+            health['trips'] += 1
+            health['failures'] = 0
+            health['open_until'] = time.time() + open_seconds
+            logging.warning(f"🚧 Căutare parcată {open_seconds}s după eșecuri repetate: {url}")
+
+def quick_check_url(url, options=None, cycle=None):
+    """Funcția de worker pentru thread-uri: backfill după o pauză, altfel scanare rapidă.
+
+    cycle este ciclul care a pornit scanarea: o scanare terminată după ce ciclul s-a închis
+    nu mai adaugă un eșantion de auto-tuning (a fost deja numărată ca depășire).
+    """
+    with active_browsers_lock:
+        if url in IN_FLIGHT_URLS:
+            return False
+        IN_FLIGHT_URLS.add(url)
+    try:
+        starved = False
+        gap_minutes = get_scan_gap_minutes(url)
+        if gap_minutes is not None and gap_minutes > BACKFILL_GAP_MINUTES:
+            with active_browsers_lock:
+                BACKFILLING_URLS.add(url)
+            found, success = backfill_search(url, gap_minutes)
+            # Durata unui backfill (mai multe pagini) nu spune nimic despre latența obișnuită
+            duration = None
+        else:
+            # Pornim scanarea efectivă a paginii (None = eșec, False = nimic nou)
+            result = run_in_browser(lambda driver: quick_check_ads(url, driver), url, options, request_url=url)
+            found, success = bool(result), result is not None
+            request_started = scan_context.request_started
+            starved = request_started is None
+            duration = time.time() - request_started if request_started else None
+        # O blocare de la OLX sau lipsa bugetului de request-uri nu e vina căutării:
+        # nu le punem la socoteala circuitului
+        blocked = not success and is_host_backing_off(url)
+        if not blocked and not starved:
+            record_scan_result(url, success)
+        record_scan_sample(duration, success, blocked, cycle)
+        return found
+    finally:
+        with active_browsers_lock:
+            IN_FLIGHT_URLS.discard(url)
+            BACKFILLING_URLS.discard(url)
+
+def build_page_url(url, page):
+    """Construiește URL-ul paginii N a unei căutări (?page=N)."""
+    parsed = urlparse(url)
+    query = [(k, v) for k, v in parse_qsl(parsed.query, keep_blank_values=True) if k != 'page']
+    if page > 1:
+        query.append(('page', str(page)))
+    return parsed._replace(query=urlencode(query)).geturl()
+
+def backfill_page(search_url, page, max_age_minutes):
+    """Worker de backfill pentru o pagină. Returnează (trimise, încărcată, continuăm)."""
+    page_url = build_page_url(search_url, page)
+
+    def task(driver):
+        cards = load_listing_page(page_url, driver)
+        if cards is None:
+            return 0, False, False
+        if not cards:
+            return 0, True, False
+        sent_count, reached_old = process_ad_cards(cards, search_url, max_age_minutes)
+        # Dacă ultimul card e încă în fereastră, merită și pagina următoare
+        oldest_minutes = parse_romanian_date(extract_date_from_preview(cards[-1]))
+        return sent_count, True, not reached_old and oldest_minutes <= max_age_minutes
+
+    with backfill_slots:
+        result = run_in_browser(task, f"{search_url} (pagina {page})", request_url=page_url)
+    return result or (0, False, False)
+
+def backfill_search(url, gap_minutes):
+    """Recuperează anunțurile apărute în pauză, parcurgând paginile în paralel (buget limitat)."""
+    import concurrent.futures
+
+    max_age_minutes = min(gap_minutes + MAX_AD_AGE_MINUTES, BACKFILL_MAX_AGE_MINUTES)
+    logging.info(f"⏪ Backfill pentru {url}: pauză de {gap_minutes:.0f} min, limită vechime {max_age_minutes:.0f} min")
+
+    sent_total = 0
+    first_page_loaded = False
+    page = 1
+    with concurrent.futures.ThreadPoolExecutor(max_workers=BACKFILL_PARALLEL_PAGES) as executor:
+        while page <= BACKFILL_MAX_PAGES:
+            wave = range(page, min(page + BACKFILL_PARALLEL_PAGES, BACKFILL_MAX_PAGES + 1))
+            results = list(executor.map(lambda p: backfill_page(url, p, max_age_minutes), wave))
+            page = wave.stop
+
+            sent_total += sum(sent for sent, _, _ in results)
+            if wave.start == 1:
+                first_page_loaded = results[0][1]
+            # Ne oprim la prima pagină goală sau care a ajuns la anunțuri prea vechi
+            if not all(more for _, _, more in results):
+                break
+
+    if first_page_loaded:
+        # Revenim la scanarea incrementală rapidă de la ciclul următor
+        set_last_scan_time(url)
+    logging.info(f"⏪ Backfill finalizat pentru {url}: {sent_total} notificări, {page - 1} pagini")
+    return sent_total > 0, first_page_loaded
 
 # Inițializare Bot
-bot = telebot.TeleBot(TELEGRAM_TOKEN)
+if TELEGRAM_API_URL:
+    # Permite rularea contra unui Bot API local (sau a unui fake în teste)
+    telebot.apihelper.API_URL = TELEGRAM_API_URL.rstrip('/') + "/bot{0}/{1}"
+    telebot.apihelper.FILE_URL = TELEGRAM_API_URL.rstrip('/') + "/file/bot{0}/{1}"
+# Handlerele rulează în worker pool-ul botului, nu în thread-ul care primește update-urile
+bot = telebot.TeleBot(TELEGRAM_TOKEN, num_threads=BOT_WORKER_THREADS)
 
 def setup_logging():
     logging.basicConfig(
@@ -211,7 +680,11 @@ ROMANIAN_MONTHS = {
 
 def is_admin(user_id):
     """Verifică dacă ID-ul de Telegram este în lista de admini."""
-    return str(user_id) in ADMIN_IDS
+    return int(user_id) in ADMIN_IDS
+
+def is_allowed_user(user_id):
+    """Adminii și membrii echipei (USER_IDS) își pot gestiona propriile căutări."""
+    return is_admin(user_id) or int(user_id) in USER_IDS
 
 def extract_title_from_url(url):
     """Extrage titlul plăcii din URL (util pentru preview rapid)."""
@@ -231,30 +704,81 @@ def extract_ad_id_from_url(url):
     match = re.search(r'ID([a-zA-Z0-9]+)', url)
     return match.group(1) if match else None
 
-def load_urls():
-    """Încarcă link-urile de căutare salvate (ex: căutare rtx 3080 defect)."""
-    if os.path.exists(URLS_FILE):
-        try:
-            with open(URLS_FILE, 'r') as f:
-                return json.load(f).get('urls', [])
-        except:
-            pass
-    return []
+def load_subscriptions():
+    """Încarcă abonamentele (căutare -> chat-uri) din URLS_FILE, o singură dată."""
+    global SUBSCRIPTIONS_LOADED
+    with subscriptions_lock:
+        if SUBSCRIPTIONS_LOADED:
+            return
+        SUBSCRIPTIONS.clear()
+        if os.path.exists(URLS_FILE):
+            try:
+                with open(URLS_FILE, 'r') as f:
+                    data = json.load(f)
+                for url, chat_ids in data.get('subscriptions', {}).items():
+                    SUBSCRIPTIONS[url] = [int(c) for c in chat_ids]
+                # Format vechi {'urls': [...]}: căutările globale merg către toate CHAT_IDS
+                for url in data.get('urls', []):
+                    SUBSCRIPTIONS.setdefault(url, list(CHAT_IDS))
+            except Exception as e:
+                logging.error(f"Eroare citire abonamente: {e}")
+        SUBSCRIPTIONS_LOADED = True
 
-def save_urls(urls):
+def save_subscriptions():
+    """Scrie abonamentele pe disc. Se apelează cu subscriptions_lock luat."""
     try:
         os.makedirs(os.path.dirname(os.path.abspath(URLS_FILE)), exist_ok=True)
         with open(URLS_FILE, 'w') as f:
-            json.dump({'urls': urls}, f, indent=2)
+            json.dump({'subscriptions': SUBSCRIPTIONS}, f, indent=2)
         return True
-    except:
+    except Exception as e:
+        logging.error(f"Eroare salvare abonamente: {e}")
         return False
+
+def load_urls():
+    """Căutările unice de scanat (o căutare comună se scanează o singură dată)."""
+    load_subscriptions()
+    with subscriptions_lock:
+        return [url for url, chat_ids in SUBSCRIPTIONS.items() if chat_ids]
+
+def get_chats_for_url(url):
+    """Chat-urile abonate la o căutare (fallback: CHAT_IDS pentru anunțuri fără căutare)."""
+    if not url:
+        return list(CHAT_IDS)
+    load_subscriptions()
+    with subscriptions_lock:
+        return list(SUBSCRIPTIONS.get(url, []))
+
+def get_urls_for_chat(chat_id):
+    """Căutările la care este abonat un chat, în ordinea adăugării."""
+    load_subscriptions()
+    with subscriptions_lock:
+        return [url for url, chat_ids in SUBSCRIPTIONS.items() if chat_id in chat_ids]
+
+def add_subscription(chat_id, url):
+    """Abonează chat-ul la o căutare. Returnează (succes, exista_deja)."""
+    load_subscriptions()
+    with subscriptions_lock:
+        chat_ids = SUBSCRIPTIONS.setdefault(url, [])
+        if chat_id in chat_ids:
+            return True, True
+        chat_ids.append(chat_id)
+        return save_subscriptions(), False
+
+def remove_subscription(chat_id, url):
+    """Dezabonează chat-ul; căutarea dispare când nu mai are abonați."""
+    load_subscriptions()
+    with subscriptions_lock:
+        chat_ids = SUBSCRIPTIONS.get(url, [])
+        if chat_id not in chat_ids:
+            return False
+        chat_ids.remove(chat_id)
+        if not chat_ids:
+            del SUBSCRIPTIONS[url]
+        return save_subscriptions()
     
-def init_database():
-    """Inițializează baza de date pentru a evita notificările duble."""
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    
+def migrate_v1_base_schema(cursor):
+    """v1: tabelele de bază, coloanele adăugate ulterior și livrările per chat."""
     # Tabel unic pentru anunțuri OLX
     cursor.execute('''
     CREATE TABLE IF NOT EXISTS ads (
@@ -268,24 +792,162 @@ def init_database():
     )
     ''')
     
+    # Coloane adăugate după prima versiune a tabelului
+    existing_columns = {row[1] for row in cursor.execute("PRAGMA table_info(ads)").fetchall()}
+    for column in ('site', 'search_url'):
+        if column not in existing_columns:
+            cursor.execute(f"ALTER TABLE ads ADD COLUMN {column} TEXT")
+    # Până acum botul a scanat doar OLX.ro
+    cursor.execute("UPDATE ads SET site = 'OLX.ro' WHERE site IS NULL")
+    # Rândurile foarte vechi pot avea NULL (codul vechi le trata ca netrimise)
+    cursor.execute("UPDATE ads SET sent_to_telegram = 0 WHERE sent_to_telegram IS NULL")
+
+    # Livrări per chat: același anunț poate apărea în căutările mai multor utilizatori
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'ad_deliveries'")
+    deliveries_existed = cursor.fetchone() is not None
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS ad_deliveries (
+        link TEXT,
+        chat_id INTEGER,
+        sent_at TIMESTAMP,
+        PRIMARY KEY (link, chat_id)
+    )
+    ''')
+    if not deliveries_existed:
+        # Anunțurile trimise înainte de abonamente au ajuns la toate CHAT_IDS
+        for chat_id in CHAT_IDS:
+            cursor.execute(
+                "INSERT OR IGNORE INTO ad_deliveries (link, chat_id, sent_at) "
+                "SELECT link, ?, date_found FROM ads WHERE sent_to_telegram = 1",
+                (chat_id,)
+            )
+
     cursor.execute('CREATE TABLE IF NOT EXISTS activity_log (id INTEGER PRIMARY KEY, action TEXT, url TEXT, timestamp TIMESTAMP)')
     cursor.execute('CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT, updated_at TIMESTAMP)')
-    
-    # Index pentru viteză la căutare link existent
-    cursor.execute('CREATE INDEX IF NOT EXISTS ads_link_idx ON ads(link)')
-    
-    conn.commit()
-    conn.close()
-    logging.info("Baza de date pregătită strict pentru OLX România.")
 
-def check_ad_exists(link):
-    """Verifică dacă anunțul există deja în baza de date."""
-    conn = sqlite3.connect(DB_FILE)
+def migrate_v2_indexes(cursor):
+    """v2: indexuri pentru interogările frecvente; ad_id devine unic."""
+    # Dublura cheii primare: SQLite are deja indexul pe link
+    cursor.execute("DROP INDEX IF EXISTS ads_link_idx")
+
+    # Același anunț salvat sub link-uri diferite (parametri de tracking): păstrăm un singur rând,
+    # de preferat cel deja trimis, apoi cel mai recent
+    cursor.execute('''
+    DELETE FROM ads WHERE rowid IN (
+        SELECT a.rowid FROM ads a JOIN ads b ON a.ad_id = b.ad_id AND a.rowid != b.rowid
+        WHERE b.sent_to_telegram > a.sent_to_telegram
+           OR (b.sent_to_telegram = a.sent_to_telegram AND b.rowid > a.rowid)
+    )
+    ''')
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS ads_ad_id_idx ON ads(ad_id)")
+
+    # Parțial: get_unsent_ads parcurge doar rândurile netrimise (v5 îl face și acoperitor)
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS ads_unsent_idx
+    ON ads(date_found, link, title, ad_id, date_published, search_url)
+    WHERE sent_to_telegram = 0
+    ''')
+    # Intervalul de 24h și ORDER BY date_found din statistici
+    cursor.execute("CREATE INDEX IF NOT EXISTS ads_date_found_idx ON ads(date_found, title)")
+    # DELETE-ul din cleanup_old_ads
+    cursor.execute("CREATE INDEX IF NOT EXISTS ads_expiry_idx ON ads(expiry_date)")
+
+def migrate_v3_counters(cursor):
+    """v3: contoare materializate, întreținute de triggere (statistici în timp constant)."""
+    cursor.execute("CREATE TABLE IF NOT EXISTS ad_counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+    # Anunțuri găsite pe oră ('YYYY-MM-DDTHH'); ultimele 24h = câteva rânduri, nu un scan
+    cursor.execute("CREATE TABLE IF NOT EXISTS ad_hourly (hour TEXT PRIMARY KEY, count INTEGER NOT NULL)")
+
+    cursor.execute("DELETE FROM ad_counters")
+    cursor.execute("INSERT INTO ad_counters (name, value) SELECT 'total', COUNT(*) FROM ads")
+    cursor.execute("INSERT INTO ad_counters (name, value) SELECT 'unsent', COUNT(*) FROM ads WHERE sent_to_telegram = 0")
+    cursor.execute("INSERT INTO ad_counters (name, value) SELECT 'site:' || IFNULL(site, ''), COUNT(*) FROM ads GROUP BY site")
+    cursor.execute("DELETE FROM ad_hourly")
+    cursor.execute(
+        "INSERT INTO ad_hourly (hour, count) SELECT substr(date_found, 1, 13), COUNT(*) FROM ads "
+        "WHERE date_found > ? GROUP BY substr(date_found, 1, 13)",
+        ((datetime.now() - timedelta(days=2)).isoformat(),)
+    )
+
+    create_counter_triggers(cursor)
+
+def create_counter_triggers(cursor):
+    """Triggerele care țin la zi ad_counters și ad_hourly (sent_to_telegram NULL = netrimis)."""
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS ads_counters_insert AFTER INSERT ON ads BEGIN
+        UPDATE ad_counters SET value = value + 1 WHERE name = 'total';
+        UPDATE ad_counters SET value = value + (IFNULL(NEW.sent_to_telegram, 0) = 0) WHERE name = 'unsent';
+        INSERT INTO ad_counters (name, value) VALUES ('site:' || IFNULL(NEW.site, ''), 1)
+            ON CONFLICT(name) DO UPDATE SET value = value + 1;
+        INSERT INTO ad_hourly (hour, count) VALUES (substr(NEW.date_found, 1, 13), 1)
+            ON CONFLICT(hour) DO UPDATE SET count = count + 1;
+    END
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS ads_counters_delete AFTER DELETE ON ads BEGIN
+        UPDATE ad_counters SET value = value - 1 WHERE name = 'total';
+        UPDATE ad_counters SET value = value - (IFNULL(OLD.sent_to_telegram, 0) = 0) WHERE name = 'unsent';
+        UPDATE ad_counters SET value = value - 1 WHERE name = 'site:' || IFNULL(OLD.site, '');
+        UPDATE ad_hourly SET count = count - 1 WHERE hour = substr(OLD.date_found, 1, 13);
+    END
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS ads_counters_sent AFTER UPDATE OF sent_to_telegram ON ads
+    WHEN OLD.sent_to_telegram IS NOT NEW.sent_to_telegram BEGIN
+        UPDATE ad_counters SET value = value - (IFNULL(OLD.sent_to_telegram, 0) = 0) + (IFNULL(NEW.sent_to_telegram, 0) = 0)
+        WHERE name = 'unsent';
+    END
+    ''')
+
+def migrate_v4_sent_nulls(cursor):
+    """v4: rândurile vechi cu sent_to_telegram NULL devin 0 (triggerele v3 eșuau pe ele)."""
+    # Triggerele v3 ar scrie NULL în contor chiar la UPDATE-ul de mai jos: le recreăm după
+    for trigger in ('ads_counters_insert', 'ads_counters_delete', 'ads_counters_sent'):
+        cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    cursor.execute("UPDATE ads SET sent_to_telegram = 0 WHERE sent_to_telegram IS NULL")
+    cursor.execute("UPDATE ad_counters SET value = (SELECT COUNT(*) FROM ads WHERE sent_to_telegram = 0) WHERE name = 'unsent'")
+    create_counter_triggers(cursor)
+
+def migrate_v5_covering_unsent_idx(cursor):
+    """v5: ads_unsent_idx include și sent_to_telegram, ca get_unsent_ads să nu mai citească tabelul."""
+    cursor.execute("DROP INDEX IF EXISTS ads_unsent_idx")
+    cursor.execute('''
+    CREATE INDEX ads_unsent_idx
+    ON ads(date_found, link, title, ad_id, date_published, search_url, sent_to_telegram)
+    WHERE sent_to_telegram = 0
+    ''')
+
+# Migrările se aplică în ordine, o singură dată; versiunea curentă e în PRAGMA user_version
+SCHEMA_MIGRATIONS = [
+    (1, migrate_v1_base_schema),
+    (2, migrate_v2_indexes),
+    (3, migrate_v3_counters),
+    (4, migrate_v4_sent_nulls),
+    (5, migrate_v5_covering_unsent_idx),
+]
+
+def init_database():
+    """Inițializează baza de date (aplică migrările lipsă) pentru a evita notificările duble."""
+    # isolation_level=None: controlăm noi tranzacțiile, ca fiecare migrare să fie atomică
+    conn = sqlite3.connect(DB_FILE, isolation_level=None)
     cursor = conn.cursor()
-    cursor.execute("SELECT 1 FROM ads WHERE link = ?", (link,))
-    exists = cursor.fetchone() is not None
-    conn.close()
-    return exists
+    try:
+        version = cursor.execute("PRAGMA user_version").fetchone()[0]
+        for target_version, migrate in SCHEMA_MIGRATIONS:
+            if target_version <= version:
+                continue
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                migrate(cursor)
+                cursor.execute(f"PRAGMA user_version = {target_version}")
+                cursor.execute("COMMIT")
+            except Exception:
+                cursor.execute("ROLLBACK")
+                raise
+            logging.info(f"🗄️ Migrare DB aplicată: v{target_version} ({migrate.__name__})")
+    finally:
+        conn.close()
+    logging.info("Baza de date pregătită strict pentru OLX România.")
 
 def get_unsent_ads():
     """Recuperează anunțurile salvate în DB care nu au fost încă trimise pe Telegram."""
@@ -294,14 +956,15 @@ def get_unsent_ads():
         cursor = conn.cursor()
         cursor.execute(
             '''
-            SELECT link, title, ad_id, date_published 
+            SELECT link, title, ad_id, date_published, search_url 
             FROM ads WHERE sent_to_telegram = 0
+            ORDER BY date_found
             '''
         )
         results = cursor.fetchall()
         conn.close()
         
-        return [{'link': r[0], 'title': r[1], 'ad_id': r[2], 'publication_date': r[3]} for r in results]
+        return [{'link': r[0], 'title': r[1], 'ad_id': r[2], 'publication_date': r[3], 'search_url': r[4]} for r in results]
     except Exception as e:
         logging.error(f"Eroare recuperează anunțuri netrimise: {e}")
         return []
@@ -313,18 +976,22 @@ def cleanup_old_ads():
     cursor = conn.cursor()
     
     cursor.execute("SELECT value FROM settings WHERE key = 'last_cleanup'")
-    last_cleanup = datetime.fromisoformat(cursor.fetchone()[0])
+    result = cursor.fetchone()
     
-    if now - last_cleanup < timedelta(days=7):
+    if result and now - datetime.fromisoformat(result[0]) < timedelta(days=7):
         conn.close()
         return False
     
     cursor.execute("DELETE FROM ads WHERE expiry_date < ?", (now.isoformat(),))
     deleted_count = cursor.rowcount
-    cursor.execute("UPDATE settings SET value = ?, updated_at = ? WHERE key = 'last_cleanup'", (now.isoformat(), now.isoformat()))
-    cursor.execute("VACUUM") # Compactează DB după ștergere
-    
+    cursor.execute("DELETE FROM ad_deliveries WHERE link NOT IN (SELECT link FROM ads)")
+    cursor.execute("DELETE FROM ad_hourly WHERE hour < ?", ((now - timedelta(days=2)).strftime('%Y-%m-%dT%H'),))
+    cursor.execute(
+        "INSERT OR REPLACE INTO settings (key, value, updated_at) VALUES ('last_cleanup', ?, ?)",
+        (now.isoformat(), now.isoformat())
+    )
     conn.commit()
+    cursor.execute("VACUUM") # Compactează DB după ștergere (nu poate rula într-o tranzacție)
     conn.close()
     logging.info(f"Cleanup finalizat. Șterse: {deleted_count} anunțuri vechi.")
     return True
@@ -382,7 +1049,17 @@ def get_cached_ad_age(ad_id, date_str):
     return minutes_ago
 
 # --- CONFIGURARE BROWSER ---
-from DrissionPage import ChromiumPage, ChromiumOptions
+# DrissionPage se importă la prima folosire: importul e lent și nu trebuie să întârzie pornirea botului
+ChromiumPage = None
+ChromiumOptions = None
+
+def load_browser_classes():
+    """Importă DrissionPage (o singură dată, la prima nevoie)."""
+    global ChromiumPage, ChromiumOptions
+    if ChromiumPage is None:
+        from DrissionPage import ChromiumPage as page_class, ChromiumOptions as options_class
+        ChromiumOptions = options_class
+        ChromiumPage = page_class
 
 # Selectorii actualizați pentru OLX.ro Desktop
 AD_CARD_SELECTORS = ['css:div[data-cy="l-card"]', 'css:div[data-testid="l-card"]']
@@ -390,10 +1067,20 @@ LINK_SELECTORS = ['css:a[href*="/oferta/"]'] # Eliminat Otomoto
 IMAGE_SELECTORS = ['css:img[src]']
 DATE_SELECTORS = ['css:p[data-testid="location-date"]']
 
-def create_browser_options():
+def create_browser_options(profile=None):
     """Configurează Chrome pentru a fi rapid și greu de detectat."""
+    load_browser_classes()
     options = ChromiumOptions()
-    options.set_user_agent("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36")
+    options.set_user_agent(profile['user_agent'] if profile else USER_AGENT_PROFILES[0])
+    if profile and profile.get('proxy'):
+        options.set_proxy(profile['proxy'])
+    if profile and profile.get('dir'):
+        options.set_user_data_path(profile['dir']['path'])
+        options.set_local_port(profile['dir']['port'])
+        options.set_argument(f"--disk-cache-size={PROFILE_DISK_CACHE_MB * 1024 * 1024}")
+    else:
+        # Profil temporar: port liber ales automat, ca să nu ne conectăm la browserul altui worker
+        options.auto_port()
     options.no_imgs = True  # CRITIC: Nu încarcă imagini = Viteză x2
     options.headless = True # Rulează în fundal
     options.set_argument("--disable-blink-features=AutomationControlled")
@@ -401,18 +1088,124 @@ def create_browser_options():
     options.set_argument("--disable-gpu")
     return options
 
+# --- GUVERNATOR REQUEST-URI (anti-blocare) ---
+
+def get_host(url):
+    return urlparse(url).netloc.lower()
+
+def is_host_backing_off(url):
+    """True dacă host-ul căutării e în pauză după o blocare."""
+    with governor_lock:
+        budget = HOST_BUDGETS.get(get_host(url))
+        return bool(budget and budget['blocked_until'] > time.time())
+
+def acquire_request_slot(url, timeout=SCAN_DEADLINE_SECONDS):
+    """Așteaptă un jeton din bugetul host-ului (token bucket) înainte de a încărca pagina.
+
+    Returnează False dacă jetonul nu vine în timeout (host în backoff lung sau buget epuizat).
+    """
+    host = get_host(url)
+    refill_per_second = HOST_REQUESTS_PER_MINUTE / 60
+    give_up_at = time.time() + timeout
+    while True:
+        with governor_lock:
+            now = time.time()
+            budget = HOST_BUDGETS.setdefault(host, {'tokens': HOST_BURST, 'updated': now, 'blocked_until': 0, 'block_streak': 0})
+            budget['tokens'] = min(HOST_BURST, budget['tokens'] + (now - budget['updated']) * refill_per_second)
+            budget['updated'] = now
+            if budget['blocked_until'] > now:
+                wait = budget['blocked_until'] - now
+            elif budget['tokens'] >= 1:
+                budget['tokens'] -= 1
+                return True
+            else:
+                wait = (1 - budget['tokens']) / refill_per_second
+        if now + wait > give_up_at:
+            return False
+        time.sleep(min(wait, 1))
+
+def choose_browser_profile(profile_dir=None):
+    """Alege proxy-ul (ponderat după scorul de sănătate) și user-agent-ul."""
+    proxies = PROXIES or [None]
+    now = time.time()
+    with governor_lock:
+        for proxy in proxies:
+            PROXY_HEALTH.setdefault(proxy, {'score': 1.0, 'cooldown_until': 0, 'blocks': 0})
+        available = [p for p in proxies if PROXY_HEALTH[p]['cooldown_until'] <= now]
+        if not available:
+            # Toate sunt pe bară: îl luăm pe cel care iese primul din cooldown
+            available = [min(proxies, key=lambda p: PROXY_HEALTH[p]['cooldown_until'])]
+        weights = [max(PROXY_HEALTH[p]['score'], 0.05) for p in available]
+        proxy = random.choices(available, weights=weights)[0]
+    if profile_dir:
+        # Un profil persistent păstrează mereu același user-agent (cookies + UA consecvente)
+        user_agent = USER_AGENT_PROFILES[profile_dir['slot'] % len(USER_AGENT_PROFILES)]
+    else:
+        user_agent = random.choice(USER_AGENT_PROFILES)
+    return {'proxy': proxy, 'user_agent': user_agent, 'dir': profile_dir}
+
+def report_request_result(url, blocked):
+    """Actualizează backoff-ul host-ului și scorul proxy-ului după o încărcare de pagină."""
+    host = get_host(url)
+    profile = getattr(scan_context, 'profile', None)
+    proxy = profile['proxy'] if profile else None
+    now = time.time()
+    with governor_lock:
+        budget = HOST_BUDGETS.get(host)
+        health = PROXY_HEALTH.setdefault(proxy, {'score': 1.0, 'cooldown_until': 0, 'blocks': 0})
+        # Medie exponențială: câteva succese recente refac scorul unui proxy
+        health['score'] = 0.8 * health['score'] + 0.2 * (0.0 if blocked else 1.0)
+        if not blocked:
+            health['blocks'] = 0
+            if budget:
+                budget['block_streak'] = 0
+            return
+
+        health['blocks'] += 1
+        health['cooldown_until'] = now + PROXY_COOLDOWN_SECONDS * health['blocks']
+        # Cookie-urile profilului pot fi cele marcate de OLX: profil nou la următoarea folosire
+        if profile and profile.get('dir'):
+            profile['dir']['rotate'] = True
+        if budget:
+            budget['block_streak'] += 1
+            backoff = min(BLOCK_BACKOFF_SECONDS * 2 ** (budget['block_streak'] - 1), BLOCK_BACKOFF_MAX_SECONDS)
+            # Jitter ca workerii să nu revină toți în aceeași secundă
+            budget['blocked_until'] = max(budget['blocked_until'], now + backoff * random.uniform(0.8, 1.2))
+            budget['tokens'] = 0
+    logging.warning(f"🛑 Blocare/captcha pe {host} (proxy: {proxy or 'direct'}). Pauză host ~{backoff if budget else 0:.0f}s.")
+
+def is_block_page(driver):
+    """Detectează pagini de captcha / acces refuzat (fără carduri de anunțuri)."""
+    try:
+        if get_ad_cards(driver):
+            return False
+        # Doar titlul și textul vizibil: HTML-ul normal OLX conține scripturi de recaptcha
+        title = (driver.title or '').lower()
+        body = driver.ele('tag:body', timeout=0)
+        text = (body.text if body else '')[:2000].lower()
+        if any(marker in title or marker in text for marker in BLOCK_PAGE_MARKERS):
+            return True
+        return bool(driver.ele('css:iframe[src*="captcha"]', timeout=0) or driver.ele('css:#px-captcha', timeout=0))
+    except Exception as e:
+        logging.debug(f"is_block_page: {e}")
+        return False
+
 def wait_for_page_load(driver, timeout=PAGE_LOAD_TIMEOUT):
     """Așteaptă până când pagina este stabilă și gata de citit."""
     start = time.time()
     prev_html = ""
     while time.time() - start < timeout:
+        check_scan_deadline()
         try:
             curr_html = driver.html
             if curr_html == prev_html and driver.run_js("return document.readyState") == "complete":
                 return True
             prev_html = curr_html
             time.sleep(0.5)
-        except: time.sleep(1)
+        except Exception as e:
+            logging.debug(f"wait_for_page_load: {e}")
+            time.sleep(1)
+    logging.warning(f"⚠️ Pagina nu s-a stabilizat în {timeout}s.")
     return False
 
 def wait_for_ads(driver, min_cards=6, timeout=15):
@@ -425,13 +1218,15 @@ def wait_for_ads(driver, min_cards=6, timeout=15):
     
     start = time.time()
     while time.time() - start < timeout:
+        check_scan_deadline()
         for selector in selectors:
             try:
                 cards = driver.eles(selector)
                 if cards and len(cards) >= min_cards:
                     logging.info(f"✅ Găsit {len(cards)} carduri cu selectorul: {selector}")
                     return True
-            except: pass
+            except Exception as e:
+                logging.debug(f"wait_for_ads ({selector}): {e}")
         time.sleep(0.5)
     
     logging.warning("⚠️ Nu s-au încărcat suficiente anunțuri în timpul alocat.")
@@ -443,7 +1238,8 @@ def get_ad_cards(driver):
         try:
             cards = driver.eles(selector)
             if cards: return cards
-        except: pass
+        except Exception as e:
+            logging.debug(f"get_ad_cards ({selector}): {e}")
     return []
 
 def is_promoted_card(card):
@@ -506,11 +1302,15 @@ def extract_preview_data(card, card_index=None):
         if detailed_log: logging.warning(f"Eroare card #{card_index}: {e}")
         return None
 
-def try_send_from_preview(card, card_index=None):
-    """Logica de 'SNIPER': Verifică, filtrează și trimite anunțul."""
+def try_send_from_preview(card, card_index=None, search_url=None, max_age_minutes=MAX_AD_AGE_MINUTES):
+    """Logica de 'SNIPER': Verifică, filtrează și trimite anunțul către abonații căutării.
+
+    Returnează (trimis, vechi, evaluat). evaluat = False când cardul n-a putut fi judecat
+    (incomplet, eroare DB): scanarea următoare trebuie să-l mai vadă o dată.
+    """
     try:
         preview_data = extract_preview_data(card, card_index)
-        if not preview_data: return False, False
+        if not preview_data: return False, False, False
 
         title = preview_data['title'].lower()
         link = preview_data['link']
@@ -526,40 +1326,51 @@ def try_send_from_preview(card, card_index=None):
         if not is_match:
             # Opțional: Poți lăsa botul să trimită și chilipiruri dacă au preț mic,
             # dar pentru început filtrăm doar defectele solicitate de tine.
-            return False, False
+            return False, False, True
 
-        # Verificare Vechime
-        if minutes_ago is None or minutes_ago > MAX_AD_AGE_MINUTES:
+        # Verificare Vechime (fără dată nu știm cât de vechi e: nici vechi, nici evaluat)
+        if minutes_ago is None:
+            logging.info(f"❔ Anunț fără dată, îl reverific la scanarea următoare: {preview_data['title']}")
+            return False, False, False
+        if minutes_ago > max_age_minutes:
             logging.info(f"⏰ Anunț prea vechi ({minutes_ago:.1f} min): {preview_data['title']}")
-            return False, True
-
-        # Verificare Bază de Date (Să nu trimitem de două ori)
-        if check_ad_exists(link):
-            if check_ad_sent(link): return False, False
-            logging.info(f"🔄 Anunț existent în DB, dar netrimis: {link}")
-        else:
-            add_ad_to_db(
-                link, 
-                preview_data['title'], 
-                "OLX.ro", 
-                preview_data['ad_id'], 
-                preview_data['publication_date']
-            )
+            return False, True, True
+
+        # Verificare Bază de Date (Să nu trimitem de două ori aceluiași chat)
+        chat_ids = get_chats_for_url(search_url)
+        added, stored_link = add_ad_to_db(
+            link, 
+            preview_data['title'], 
+            "OLX.ro", 
+            preview_data['ad_id'], 
+            preview_data['publication_date'],
+            search_url
+        )
+        if stored_link is None: return False, False, False
+        # Rezervăm livrările înainte de trimitere, per chat și pe link-ul salvat (eventual alt link,
+        # cu parametri de tracking): abonații mai multor căutări îl primesc o singură dată
+        chat_ids = claim_ad_deliveries(stored_link, chat_ids)
+        if chat_ids is None: return False, False, False
+        if not chat_ids: return False, False, True
+        if not added:
+            logging.info(f"🔄 Anunț existent în DB, netrimis către {len(chat_ids)} chat-uri: {stored_link}")
+        preview_data['link'] = stored_link
+        preview_data['chat_ids'] = chat_ids
 
         # Trimitere pe Telegram
         sent = send_to_telegram(preview_data)
-        return sent, False
+        return sent, False, sent
 
     except Exception as e:
         logging.warning(f"Eroare procesare card: {e}")
-        return False, True
+        return False, True, False
     
-def send_telegram_message_with_retry(chat_id, message, parse_mode=None, photo=None, max_retries=5, retry_delay=3):
+def send_telegram_message_with_retry(chat_id, message, parse_mode=None, photo=None, max_retries=5, retry_delay=3, timeout=None):
     """Trimite mesajul către Telegram cu logică de reîncercare (exponential backoff)."""
     for attempt in range(max_retries):
         try:
             if photo:
-                return bot.send_photo(chat_id, photo, caption=message, parse_mode=parse_mode)
+                return bot.send_photo(chat_id, photo, caption=message, parse_mode=parse_mode, timeout=timeout)
             else:
                 return bot.send_message(chat_id, message, parse_mode=parse_mode)
         except Exception as e:
@@ -572,41 +1383,218 @@ def send_telegram_message_with_retry(chat_id, message, parse_mode=None, photo=No
             logging.info(f"⚠️ Eroare Telegram. Reîncercare în {wait_time}s...")
             time.sleep(wait_time)
 
+def get_cached_file_id(image_url):
+    """file_id-ul Telegram pentru o imagine deja trimisă (None dacă nu e în cache)."""
+    with media_cache_lock:
+        file_id = MEDIA_FILE_ID_CACHE.get(image_url)
+        if file_id is not None:
+            MEDIA_FILE_ID_CACHE.move_to_end(image_url)
+        return file_id
+
+def cache_file_id(image_url, file_id):
+    """Salvează file_id-ul (sau IMAGE_FAILED) și păstrează cache-ul sub MAX_MEDIA_CACHE_SIZE."""
+    with media_cache_lock:
+        if file_id == IMAGE_FAILED and MEDIA_FILE_ID_CACHE.get(image_url):
+            # Un file_id valid nu se pierde din cauza unei erori ulterioare
+            return
+        MEDIA_FILE_ID_CACHE[image_url] = file_id
+        MEDIA_FILE_ID_CACHE.move_to_end(image_url)
+        while len(MEDIA_FILE_ID_CACHE) > MAX_MEDIA_CACHE_SIZE:
+            MEDIA_FILE_ID_CACHE.popitem(last=False)
+
+def is_image_slow(image_url):
+    """True dacă imaginea a dat de curând timeout (nu mai așteptăm după ea pentru alte chat-uri)."""
+    with media_cache_lock:
+        return SLOW_IMAGE_URLS.get(image_url, 0) > time.time()
+
+def mark_image_slow(image_url):
+    now = time.time()
+    with media_cache_lock:
+        for url in [url for url, until in SLOW_IMAGE_URLS.items() if until <= now]:
+            del SLOW_IMAGE_URLS[url]
+        SLOW_IMAGE_URLS[image_url] = now + IMAGE_SLOW_SECONDS
+
+def is_image_fetch_error(e):
+    """True doar pentru erorile în care Telegram nu poate prelua imaginea (nu 403/429/Markdown)."""
+    description = str(getattr(e, 'description', None) or e).lower()
+    return getattr(e, 'error_code', None) == 400 and any(marker in description for marker in IMAGE_FETCH_ERRORS)
+
+def send_ad_message(chat_id, caption, image_url=None, parse_mode="Markdown"):
+    """Trimite anunțul cu imagine, refolosind file_id-ul; cade pe text dacă imaginea e lentă sau lipsă."""
+    if image_url and image_url.startswith('http'):
+        file_id = get_cached_file_id(image_url)
+        if file_id:
+            try:
+                # Telegram are deja imaginea: trimiterea e instant, fără descărcare de pe CDN-ul OLX
+                return send_telegram_message_with_retry(chat_id, caption, parse_mode=parse_mode, photo=file_id)
+            except Exception as e:
+                # Eroare a acestui chat (blocat, rate limit...): file_id-ul rămâne valabil pentru ceilalți
+                logging.warning(f"🖼️ Poză netrimisă către {chat_id} ({e}), încerc doar text")
+        elif file_id is None and not is_image_slow(image_url):
+            try:
+                # Prima trimitere: o singură încercare, cu timeout scurt; reîncercările merg pe text
+                message = send_telegram_message_with_retry(
+                    chat_id, caption, parse_mode=parse_mode, photo=image_url,
+                    max_retries=1, timeout=IMAGE_SEND_TIMEOUT
+                )
+                if message and message.photo:
+                    cache_file_id(image_url, message.photo[-1].file_id)
+                return message
+            except telebot.apihelper.ApiTelegramException as e:
+                if is_image_fetch_error(e):
+                    # Telegram a răspuns explicit că nu poate prelua imaginea: nu mai încercăm URL-ul
+                    logging.warning(f"🖼️ Imagine refuzată de Telegram ({e}), trimit doar text către {chat_id}")
+                    cache_file_id(image_url, IMAGE_FAILED)
+                else:
+                    logging.warning(f"🖼️ Poză netrimisă către {chat_id} ({e}), încerc doar text")
+            except Exception as e:
+                # Timeout/rețea: poza poate ajunge totuși; restul chat-urilor nu mai așteaptă după ea
+                logging.warning(f"🖼️ Imagine fără răspuns la timp ({e}), trimit doar text către {chat_id}")
+                mark_image_slow(image_url)
+    return send_telegram_message_with_retry(chat_id, caption, parse_mode=parse_mode)
+
+def format_ad_caption(ad, minutes_ago):
+    """Mesajul complet pentru un singur anunț."""
+    # Flag pentru anunțuri sub 5 minute (Ultra-proaspete)
+    is_very_fresh = isinstance(minutes_ago, (int, float)) and minutes_ago <= VERY_FRESH_AD_MINUTES
+
+    header = "🔥 *ANUNȚ NOU (ULTRA-FRESH)*" if is_very_fresh else "📌 *OPORTUNITATE DETECTATĂ*"
+    
+    return (
+        f"{header}\n\n"
+        f"📦 *Titlu:* {ad['title']}\n"
+        f"⏱️ *Publicat acum:* {minutes_ago:.1f} min\n"
+        f"📆 *Data OLX:* {ad.get('publication_date', 'Necunoscută')}\n\n"
+        f"🔗 [VEZI ANUNȚUL PE OLX]({ad['link']})"
+    )
+
+def clean_link_text(text):
+    """Scoate caracterele Markdown din textul unui link (în Markdown-ul vechi nu se pot escapa acolo)."""
+    return re.sub(r'[_*`\[\]]', ' ', text).strip()
+
+def format_digest_line(index, item):
+    ad = item['ad']
+    return f"{index}. [{clean_link_text(ad['title'])}]({ad['link']}) · ⏱️ {item['minutes_ago']:.0f} min"
+
+def send_digest(chat_id, items):
+    """Trimite un lot de anunțuri non-urgente ca un singur mesaj (sau album)."""
+    if len(items) == 1:
+        item = items[0]
+        send_ad_message(chat_id, format_ad_caption(item['ad'], item['minutes_ago']), item['ad'].get('image'))
+        return
+
+    with_images = [item for item in items if (item['ad'].get('image') or '').startswith('http')]
+    if DIGEST_AS_MEDIA_GROUP and len(with_images) >= 2:
+        try:
+            media = []
+            for index, item in enumerate(with_images, 1):
+                image_url = item['ad']['image']
+                media.append(types.InputMediaPhoto(
+                    get_cached_file_id(image_url) or image_url,
+                    caption=format_digest_line(index, item),
+                    parse_mode="Markdown"
+                ))
+            messages = bot.send_media_group(chat_id, media)
+            for item, message in zip(with_images, messages or []):
+                if message.photo:
+                    cache_file_id(item['ad']['image'], message.photo[-1].file_id)
+            items = [item for item in items if item not in with_images]
+            if not items:
+                return
+        except Exception as e:
+            logging.warning(f"🖼️ Album digest eșuat ({e}), trimit lista text către {chat_id}")
+
+    lines = [format_digest_line(index, item) for index, item in enumerate(items, 1)]
+    text = f"📬 *{len(items)} oportunități noi*\n\n" + "\n".join(lines)
+    send_telegram_message_with_retry(chat_id, text, parse_mode="Markdown")
+
+def digest_worker():
+    """Golește cozile de digest: la DIGEST_INTERVAL_SECONDS sau imediat ce o coadă e plină."""
+    while True:
+        with digest_condition:
+            now = time.time()
+            oldest = [items[0]['queued_at'] for items in DIGEST_QUEUES.values() if items]
+            timeout = max(0.1, min(oldest) + DIGEST_INTERVAL_SECONDS - now) if oldest else DIGEST_INTERVAL_SECONDS
+            digest_condition.wait(timeout=timeout)
+
+            now = time.time()
+            batches = {}
+            for chat_id, items in DIGEST_QUEUES.items():
+                if items and (len(items) >= DIGEST_MAX_ITEMS or now - items[0]['queued_at'] >= DIGEST_INTERVAL_SECONDS):
+                    batches[chat_id] = items[:DIGEST_MAX_ITEMS]
+                    del items[:DIGEST_MAX_ITEMS]
+
+        for chat_id, items in batches.items():
+            try:
+                send_digest(chat_id, items)
+                for item in items:
+                    record_first_alert(item['ad'])
+                logging.info(f"📬 Digest cu {len(items)} anunțuri trimis către {chat_id}")
+            except Exception as e:
+                logging.error(f"❌ Eroare trimitere digest către {chat_id}: {e}")
+
+def record_first_alert(ad):
+    """Latența request pagină -> prima alertă livrată efectiv (o dată per scanare, inclusiv prin digest)."""
+    scan_stats = ad.get('scan_stats')
+    if not scan_stats:
+        return
+    with lock:
+        if scan_stats.get('first_sent_at'):
+            return
+        scan_stats['first_sent_at'] = time.time()
+    first_alert_seconds = scan_stats['first_sent_at'] - scan_stats['requested_at']
+    FIRST_ALERT_SECONDS.append(first_alert_seconds)
+    logging.info(f"⚡ Prima alertă la {first_alert_seconds:.1f}s de la request-ul paginii")
+
+def enqueue_digest(chat_ids, ad, minutes_ago):
+    """Pune anunțul în coada de digest a fiecărui chat."""
+    global digest_worker_started
+    with digest_condition:
+        if not digest_worker_started:
+            threading.Thread(target=digest_worker, daemon=True).start()
+            digest_worker_started = True
+        queue_full = False
+        for chat_id in chat_ids:
+            items = DIGEST_QUEUES.setdefault(chat_id, [])
+            items.append({'ad': ad, 'minutes_ago': minutes_ago, 'queued_at': time.time()})
+            queue_full = queue_full or len(items) >= DIGEST_MAX_ITEMS
+        if queue_full:
+            digest_condition.notify()
+
 def send_to_telegram(ad):
-    """Pregătește și trimite notificarea în mod asincron pentru a nu bloca scanerul."""
+    """Pregătește și trimite notificarea în mod asincron pentru a nu bloca scanerul.
+
+    Anunțurile ultra-fresh pleacă imediat; restul intră în digestul periodic al fiecărui chat.
+    """
     try:
         logging.info(f"📤 Livrare notificare: {ad['title']}")
 
+        # Fan-out doar către chat-urile interesate (fallback: toate CHAT_IDS)
+        chat_ids = ad['chat_ids'] if 'chat_ids' in ad else list(CHAT_IDS)
+        ad['scan_stats'] = getattr(scan_context, 'scan_stats', None)
+
         with lock:
-            mark_success = mark_ad_as_sent(ad['link'])
+            mark_success = mark_ad_as_sent(ad['link'], chat_ids)
             if not mark_success:
                 logging.warning(f"⚠️ DB Error: Nu am putut marca anunțul ca trimis.")
 
-        def send_telegram_async():
-            try:
-                ad_id = ad.get('ad_id')
-                date_str = ad.get('publication_date', '')
-                minutes_ago = ad.get('minutes_ago') or get_cached_ad_age(ad_id, date_str)
+        ad_id = ad.get('ad_id')
+        date_str = ad.get('publication_date', '')
+        minutes_ago = ad.get('minutes_ago') or get_cached_ad_age(ad_id, date_str)
 
-                # Flag pentru anunțuri sub 5 minute (Ultra-proaspete)
-                is_very_fresh = isinstance(minutes_ago, (int, float)) and minutes_ago <= VERY_FRESH_AD_MINUTES
+        if not (isinstance(minutes_ago, (int, float)) and minutes_ago <= VERY_FRESH_AD_MINUTES):
+            enqueue_digest(chat_ids, ad, minutes_ago)
+            return True
 
-                header = "🔥 *ANUNȚ NOU (ULTRA-FRESH)*" if is_very_fresh else "📌 *OPORTUNITATE DETECTATĂ*"
-                
-                caption = (
-                    f"{header}\n\n"
-                    f"📦 *Titlu:* {ad['title']}\n"
-                    f"⏱️ *Publicat acum:* {minutes_ago:.1f} min\n"
-                    f"📆 *Data OLX:* {ad.get('publication_date', 'Necunoscută')}\n\n"
-                    f"🔗 [VEZI ANUNȚUL PE OLX]({ad['link']})"
-                )
+        def send_telegram_async():
+            try:
+                caption = format_ad_caption(ad, minutes_ago)
 
-                for chat_id in CHAT_IDS:
+                # Chat-urile se servesc în ordine: primul trimite URL-ul, restul refolosesc file_id-ul
+                for chat_id in chat_ids:
                     try:
-                        if ad.get('image'):
-                            send_telegram_message_with_retry(chat_id, caption, parse_mode="Markdown", photo=ad['image'])
-                        else:
-                            send_telegram_message_with_retry(chat_id, caption, parse_mode="Markdown")
+                        send_ad_message(chat_id, caption, ad.get('image'))
+                        record_first_alert(ad)
                         logging.info(f"✅ Notificare trimisă cu succes către {chat_id}")
                     except Exception as err:
                         logging.error(f"❌ Eroare trimitere chat {chat_id}: {err}")
@@ -614,7 +1602,6 @@ def send_to_telegram(ad):
             except Exception as e:
                 logging.error(f"🔥 Eroare în thread-ul de Telegram: {e}")
 
-        import threading
         # Folosim threading ca să nu stăm după API-ul Telegram (latență minimă)
         telegram_thread = threading.Thread(target=send_telegram_async, daemon=True)
         telegram_thread.start()
@@ -624,66 +1611,208 @@ def send_to_telegram(ad):
         logging.error(f"🔥 Eroare generală send_to_telegram: {e}")
         return False
 
-def quick_check_ads(url, driver):
-    """Bucla principală de verificare pentru un singur URL de căutare."""
-    logging.info(f"🔍 Scanare URL: {url}")
-    sent_count = 0
-    consecutive_old_count = 0
+def load_listing_page(url, driver):
+    """Deschide o pagină de rezultate, închide bannerul de cookies și face scroll.
+
+    Returnează cardurile ([] pentru o căutare fără rezultate) sau None dacă pagina nu s-a încărcat
+    ori OLX a răspuns cu o pagină de blocare. Jetonul de request l-a luat deja run_in_browser.
+    """
+    driver.get(url)
+    check_scan_deadline()
+
+    if not wait_for_page_load(driver): return None
+    # Verificăm blocarea înainte de wait_for_ads, altfel am pierde 15s pe o pagină de captcha
+    blocked = is_block_page(driver)
+    report_request_result(url, blocked)
+    if blocked: return None
+    # Căutările cu puține rezultate nu ajung la min_cards; continuăm cu ce există
+    wait_for_ads(driver)
+
+    accept_cookie_consent(driver)
+
+    # Scroll pentru a încărca elementele lazy-load (imagini/link-uri)
+    for i in range(SCROLL_COUNT):
+        check_scan_deadline()
+        driver.run_js(f"window.scrollTo(0, {(i+1) * 800});")
+        time.sleep(0.5)
+
+    return get_ad_cards(driver)
 
+def accept_cookie_consent(driver):
+    """Închide bannerul de cookies OLX.RO, o singură dată per profil persistent."""
+    # Profilurile persistente păstrează consimțământul: bannerul se închide o singură dată per profil
+    profile = getattr(scan_context, 'profile', None)
+    profile_dir = profile.get('dir') if profile else None
+    if profile_dir and profile_dir['consented']:
+        return
     try:
-        start_time = time.time()
-        driver.get(url)
+        # Încercăm să închidem bannerul de cookies automat
+        driver.run_js("localStorage.setItem('olx-consent', 'true');")
+        accept_btn = driver.eles('css:button[data-role="accept-consent"]')
+        if accept_btn:
+            accept_btn[0].click()
+            time.sleep(0.5)
+            # Doar după un click reușit: bannerul poate să nu fi apărut încă la această scanare
+            if profile_dir:
+                mark_profile_consented(profile_dir)
+    except Exception as e:
+        logging.debug(f"Banner cookies: {e}")
 
-        if not wait_for_page_load(driver): return False
-        if not wait_for_ads(driver): return False
+def stream_ad_cards(url, driver, state):
+    """Generator: dă mai departe cardurile imediat ce apar în DOM, cât timp pagina încă se încarcă.
 
-        # --- GESTIONARE COOKIES OLX.RO ---
+    Între citiri, dacă nu apar carduri noi, face scroll (lazy-load). Se oprește la
+    MAX_CARDS_TO_CHECK, la PAGE_LOAD_TIMEOUT sau când pagina nu mai produce carduri.
+    Un card pleacă doar când e complet: a apărut deja cardul următor sau HTML-ul s-a parsat tot.
+    state['loaded'] / state['blocked'] spun apelantului dacă pagina a răspuns deloc.
+    """
+    try:
+        # driver.get se întoarce imediat, fără să aștepte evenimentul load
+        driver.set.load_mode.none()
+    except Exception as e:
+        logging.debug(f"load_mode none indisponibil: {e}")
+    driver.get(url)
+
+    last_index = SKIP_FIRST_N_ADS + MAX_CARDS_TO_CHECK
+    seen = 0
+    idle_polls = 0
+    scrolls = 0
+    started = time.time()
+    while seen < last_index and time.time() - started < PAGE_LOAD_TIMEOUT:
+        check_scan_deadline()
+        cards = get_ad_cards(driver)
         try:
-            # Încercăm să închidem bannerul de cookies automat
-            driver.run_js("localStorage.setItem('olx-consent', 'true');")
-            accept_btn = driver.eles('css:button[data-role="accept-consent"]')
-            if accept_btn:
-                accept_btn[0].click()
-                time.sleep(0.5)
-        except: pass
-
-        # Scroll pentru a încărca elementele lazy-load (imagini/link-uri)
-        for i in range(SCROLL_COUNT):
-            driver.run_js(f"window.scrollTo(0, {(i+1) * 800});")
-            time.sleep(0.5)
+            ready_state = driver.run_js("return document.readyState")
+        except Exception:
+            ready_state = 'loading'
+        # Cât timp parserul încă scrie în DOM, ultimul card poate fi fără link sau dată
+        ready_count = len(cards) - 1 if ready_state == 'loading' else len(cards)
+        if ready_count > seen:
+            if not state['loaded']:
+                state['loaded'] = True
+                report_request_result(url, False)
+            # Sărim peste primele SKIP_FIRST_N_ADS (promovate), ca în scanarea clasică
+            for card in cards[max(seen, SKIP_FIRST_N_ADS):min(ready_count, last_index)]:
+                yield card
+            seen = min(ready_count, last_index)
+            idle_polls = 0
+            continue
 
-        all_cards = get_ad_cards(driver)
-        if not all_cards: return False
+        idle_polls += 1
+        if idle_polls >= STREAM_IDLE_POLLS:
+            page_complete = ready_state == 'complete'
+            if not state['loaded'] and page_complete:
+                # Pagina s-a încărcat complet fără niciun card: captcha sau căutare goală
+                state['blocked'] = is_block_page(driver)
+                report_request_result(url, state['blocked'])
+                state['loaded'] = not state['blocked']
+                return
+            if state['loaded'] and scrolls < SCROLL_COUNT:
+                driver.run_js(f"window.scrollTo(0, {(scrolls + 1) * 800});")
+                scrolls += 1
+                idle_polls = 0
+            elif page_complete:
+                return
+        time.sleep(STREAM_POLL_SECONDS)
+
+    if not state['loaded'] and is_block_page(driver):
+        # Paginile de blocare nu ajung mereu la 'complete': backoff-ul trebuie aplicat oricum
+        state['blocked'] = True
+        report_request_result(url, True)
+
+def get_card_ad_id(card):
+    """ad_id-ul unui card, citit direct din link (fără extragerea completă a preview-ului)."""
+    try:
+        link_element = card.ele('css:a[href*="/oferta/"]')
+        return extract_ad_id_from_url(link_element.attr('href')) if link_element else None
+    except Exception:
+        return None
 
-        # Procesăm doar primele X carduri (cele mai noi)
-        cards_to_process = all_cards[SKIP_FIRST_N_ADS : MAX_CARDS_TO_CHECK + SKIP_FIRST_N_ADS]
+def process_ad_cards(cards, search_url, max_age_minutes=MAX_AD_AGE_MINUTES, watermark=None, scan_stats=None):
+    """Trece cardurile prin filtrare/dedup/trimitere. Returnează (trimise, am_ajuns_la_vechi).
 
-        for idx, card in enumerate(cards_to_process):
-            # Sărim peste cele promovate dacă nu sunt ultra-fresh (pierdere de timp)
-            if is_promoted_card(card): continue
+    Cu watermark (ad_id-ul celui mai nou anunț de la scanarea anterioară), ne oprim când îl
+    întâlnim: tot ce urmează a fost deja procesat. scan_stats primește 'newest_ad_id' pentru
+    watermark-ul următor: primul card evaluat complet (cele eșuate de deasupra lui se reverifică).
+    """
+    sent_count = 0
+    consecutive_old_count = 0
 
-            sent, is_old = try_send_from_preview(card, card_index=idx)
+    for idx, card in enumerate(cards):
+        check_scan_deadline()
+        # Sărim peste cele promovate dacă nu sunt ultra-fresh (pierdere de timp)
+        if is_promoted_card(card): continue
 
-            if sent:
-                sent_count += 1
-                consecutive_old_count = 0
-            elif is_old:
-                consecutive_old_count += 1
-            
-            # Strategie de ieșire: dacă ultimele 2-3 sunt vechi, toată pagina e veche
-            if EARLY_EXIT_ON_OLD and consecutive_old_count >= CONSECUTIVE_OLD_COUNT:
-                logging.info(f"⏹️ Scanare oprită: am ajuns la anunțuri vechi.")
-                break
+        ad_id = get_card_ad_id(card) if watermark or scan_stats is not None else None
+        if watermark and ad_id == watermark:
+            logging.info("⏹️ Scanare oprită: am ajuns la anunțurile deja văzute.")
+            return sent_count, False
+
+        sent, is_old, evaluated = try_send_from_preview(card, card_index=idx, search_url=search_url, max_age_minutes=max_age_minutes)
+
+        # Watermark-ul nu trece de un card neevaluat (incomplet sau eroare DB)
+        if evaluated and scan_stats is not None and ad_id and not scan_stats.get('newest_ad_id'):
+            scan_stats['newest_ad_id'] = ad_id
+
+        if sent:
+            sent_count += 1
+            consecutive_old_count = 0
+        elif is_old:
+            consecutive_old_count += 1
+        
+        # Strategie de ieșire: dacă ultimele 2-3 sunt vechi, toată pagina e veche
+        if EARLY_EXIT_ON_OLD and consecutive_old_count >= CONSECUTIVE_OLD_COUNT:
+            logging.info(f"⏹️ Scanare oprită: am ajuns la anunțuri vechi.")
+            return sent_count, True
+
+    return sent_count, False
+
+def quick_check_ads(url, driver):
+    """Bucla principală de verificare pentru un singur URL de căutare."""
+    logging.info(f"🔍 Scanare URL: {url}")
+
+    try:
+        start_time = time.time()
+        scan_stats = {'requested_at': start_time}
+        # send_to_telegram atașează scan_stats anunțurilor, pentru latența primei alerte livrate
+        scan_context.scan_stats = scan_stats
+        watermark = SEARCH_WATERMARKS.get(url)
+
+        if STREAMING_SCAN:
+            # Filtrarea/trimiterea rulează pe fiecare card imediat ce apare; încărcarea continuă între carduri
+            state = {'loaded': False, 'blocked': False}
+            cards_stream = stream_ad_cards(url, driver, state)
+            try:
+                sent_count, _ = process_ad_cards(cards_stream, url, watermark=watermark, scan_stats=scan_stats)
+            finally:
+                cards_stream.close()
+            if not state['loaded']: return None
+            accept_cookie_consent(driver)
+        else:
+            all_cards = load_listing_page(url, driver)
+            if all_cards is None: return None
+
+            # Procesăm doar primele X carduri (cele mai noi)
+            cards_to_process = all_cards[SKIP_FIRST_N_ADS : MAX_CARDS_TO_CHECK + SKIP_FIRST_N_ADS]
+            sent_count, _ = process_ad_cards(cards_to_process, url, watermark=watermark, scan_stats=scan_stats)
+        set_last_scan_time(url)
+        if scan_stats.get('newest_ad_id'):
+            SEARCH_WATERMARKS[url] = scan_stats['newest_ad_id']
 
         logging.info(f"🏁 Finalizat: {sent_count} notificări noi trimise în {time.time() - start_time:.1f}s")
         return sent_count > 0
 
+    except ScanTimeout:
+        raise
     except Exception as e:
         logging.error(f"❌ Eroare la scanarea URL-ului: {e}")
-        return False
+        return None
+    finally:
+        # Thread-urile din pool sunt refolosite pentru alte căutări
+        scan_context.scan_stats = None
 
 def quick_check_all_urls():
-    """Verifică toate căutările tale (ex: RTX 3070, RX 6800, etc.) în paralel."""
+    """Verifică toate căutările unice ale tuturor abonaților în paralel."""
     urls = load_urls()
     if not urls:
         logging.info("ℹ️ Nu ai adăugat niciun URL de monitorizat. Folosește /addurl.")
@@ -692,38 +1821,185 @@ def quick_check_all_urls():
     found_fresh = False
     process_unsent_ads() # Încercăm să trimitem restanțele din DB
 
+    paused = [url for url in urls if is_host_backing_off(url)]
+    if paused:
+        logging.info(f"🛑 {len(paused)} căutări amânate: OLX ne-a blocat recent, așteptăm backoff-ul.")
+    urls = [url for url in urls if url not in paused]
+
+    parked = [url for url in urls if is_circuit_open(url)]
+    urls = [url for url in urls if url not in parked]
+    if parked:
+        logging.info(f"🚧 {len(parked)} căutări parcate temporar (circuit deschis).")
+    if not urls:
+        return False
+
+    # Cele mai demult scanate pleacă primele: dacă ciclul nu le prinde pe toate, restul nu rămân mereu la coadă
+    gaps = {url: get_scan_gap_minutes(url) for url in urls}
+    urls.sort(key=lambda url: -gaps[url] if gaps[url] is not None else float('-inf'))
+
     import concurrent.futures
-    # Multi-threading pentru a verifica 3-4 căutări simultan
-    max_workers = min(MAX_PARALLEL_URLS, len(urls))
+    # Numărul de browsere paralele vine de la auto-tuning (între MIN și MAX_PARALLEL_URLS_LIMIT)
+    with tuning_lock:
+        max_workers = min(SCAN_TUNING['workers'], len(urls))
     
-    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = {executor.submit(quick_check_url, url): url for url in urls}
-        for future in concurrent.futures.as_completed(futures):
-            if future.result(): found_fresh = True
+    cycle = {'open': True}
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+    futures = {executor.submit(quick_check_url, url, cycle=cycle): url for url in urls}
+    # Nu așteptăm la nesfârșit: o scanare blocată nu are voie să oprească tot ciclul
+    done, not_done = concurrent.futures.wait(futures, timeout=CYCLE_DEADLINE_SECONDS)
+    for future in done:
+        if future.result(): found_fresh = True
+    # Scanările rămase se termină în fundal (watchdog-ul le limitează), cele nepornite se anulează
+    executor.shutdown(wait=False, cancel_futures=True)
+    with tuning_lock:
+        cycle['open'] = False
+    postponed = [futures[future] for future in not_done if future.cancelled()]
+    for future in not_done:
+        # Cele terminate între timp și-au notat deja eșantionul
+        if future.cancelled() or future.done():
+            continue
+        with active_browsers_lock:
+            backfilling = futures[future] in BACKFILLING_URLS
+        if backfilling:
+            # Un backfill după o pauză durează mai multe pagini: nu e semn de suprasarcină
+            logging.info(f"⏪ Backfill-ul pentru {futures[future]} continuă după {CYCLE_DEADLINE_SECONDS}s.")
+            continue
+        logging.warning(f"⌛ Scanarea pentru {futures[future]} depășește {CYCLE_DEADLINE_SECONDS}s, trecem mai departe.")
+        record_scan_sample(CYCLE_DEADLINE_SECONDS, False, False)
+    if postponed:
+        # Nu e un eșec al căutărilor: n-au apucat să pornească și vor fi primele la ciclul următor
+        logging.warning(f"⏭️ {len(postponed)} căutări nepornite în {CYCLE_DEADLINE_SECONDS}s, amânate pentru ciclul următor: {', '.join(postponed)}")
 
+    tune_scan_concurrency(max_workers)
     return found_fresh
 
-def show_admin_menu(chat_id):
+# --- AUTO-TUNING PARALELISM (AIMD) ---
+
+def record_scan_sample(duration, success, blocked, cycle=None):
+    """Notează rezultatul unei scanări pentru decizia de la finalul ciclului (dacă ciclul e încă deschis)."""
+    with tuning_lock:
+        if cycle is not None and not cycle['open']:
+            return
+        CYCLE_SAMPLES.append((duration, success, blocked))
+
+def get_load_per_core():
+    """Load average pe 1 minut raportat la numărul de nuclee (None pe Windows)."""
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    except (AttributeError, OSError):
+        return None
+
+def get_free_memory_mb():
+    """Memoria disponibilă din /proc/meminfo (None dacă nu e Linux)."""
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+def tune_scan_concurrency(used_workers):
+    """Ajustează numărul de browsere paralele: +1 când totul e sănătos, /2 la semne de suprasarcină."""
+    with tuning_lock:
+        samples = list(CYCLE_SAMPLES)
+        CYCLE_SAMPLES.clear()
+    if not samples:
+        return
+
+    durations = sorted(d for d, _, _ in samples if d is not None)
+    p90_seconds = durations[int(0.9 * (len(durations) - 1))] if durations else None
+    error_rate = sum(1 for _, success, blocked in samples if not success or blocked) / len(samples)
+    block_rate = sum(1 for _, _, blocked in samples if blocked) / len(samples)
+    load_per_core = get_load_per_core()
+    free_memory_mb = get_free_memory_mb()
+
+    with tuning_lock:
+        workers = SCAN_TUNING['workers']
+        if block_rate > 0:
+            # OLX ne blochează: mai puține request-uri simultane, nu mai multe
+            new_workers, decision = workers // 2, f"blocări {block_rate:.0%}"
+        elif error_rate > MAX_SCAN_ERROR_RATE:
+            new_workers, decision = workers // 2, f"erori {error_rate:.0%}"
+        elif p90_seconds is not None and p90_seconds > TARGET_SCAN_SECONDS:
+            new_workers, decision = workers // 2, f"p90 {p90_seconds:.1f}s > {TARGET_SCAN_SECONDS}s"
+        elif load_per_core is not None and load_per_core > MAX_LOAD_PER_CORE:
+            new_workers, decision = workers // 2, f"CPU load {load_per_core:.2f}/nucleu"
+        elif free_memory_mb is not None and free_memory_mb < MIN_FREE_MEMORY_MB:
+            new_workers, decision = workers // 2, f"memorie liberă {free_memory_mb:.0f} MB"
+        elif used_workers < workers:
+            # Nu am avut destule căutări ca să folosim toate sloturile: nu avem dovezi pentru mai mult
+            new_workers, decision = workers, "fără modificări (sloturi nefolosite)"
+        elif free_memory_mb is not None and free_memory_mb < MIN_FREE_MEMORY_MB + BROWSER_MEMORY_MB:
+            new_workers, decision = workers, "fără modificări (memorie insuficientă pentru încă un browser)"
+        else:
+            new_workers, decision = workers + 1, "sănătos"
+
+        new_workers = max(MIN_PARALLEL_URLS, min(MAX_PARALLEL_URLS_LIMIT, new_workers))
+        SCAN_TUNING.update(
+            workers=new_workers,
+            last_decision=decision,
+            last_update=datetime.now().strftime('%H:%M:%S'),
+            metrics={
+                'scanări': len(samples),
+                'p90_s': p90_seconds,
+                'rata_erori': error_rate,
+                'rata_blocări': block_rate,
+                'load_per_nucleu': load_per_core,
+                'memorie_liberă_mb': free_memory_mb,
+            },
+        )
+    if new_workers != workers:
+        logging.info(f"🎛️ Auto-tuning: {workers} -> {new_workers} browsere paralele ({decision})")
+
+def format_tuning_report():
+    """Textul pentru comanda /tuning."""
+    with tuning_lock:
+        tuning = dict(SCAN_TUNING)
+    metrics = tuning['metrics']
+    first_alerts = sorted(FIRST_ALERT_SECONDS)
+    first_alert_median = first_alerts[len(first_alerts) // 2] if first_alerts else None
+
+    def fmt(value, pattern):
+        return pattern.format(value) if value is not None else "n/a"
+
+    return (
+        "🎛️ Auto-tuning scanare:\n\n"
+        f"Browsere paralele: {tuning['workers']} (limite {MIN_PARALLEL_URLS}-{MAX_PARALLEL_URLS_LIMIT})\n"
+        f"Ultima decizie: {tuning['last_decision']} ({tuning['last_update'] or '-'})\n\n"
+        f"Scanări în ultimul ciclu: {metrics.get('scanări', 0)}\n"
+        f"p90 durată: {fmt(metrics.get('p90_s'), '{:.1f}s')} (țintă {TARGET_SCAN_SECONDS}s)\n"
+        f"Rată erori: {fmt(metrics.get('rata_erori'), '{:.0%}')}, blocări: {fmt(metrics.get('rata_blocări'), '{:.0%}')}\n"
+        f"Load/nucleu: {fmt(metrics.get('load_per_nucleu'), '{:.2f}')}\n"
+        f"Memorie liberă: {fmt(metrics.get('memorie_liberă_mb'), '{:.0f} MB')}\n"
+        f"Prima alertă (mediană, ultimele {len(first_alerts)}): {fmt(first_alert_median, '{:.1f}s')}\n"
+    )
+
+def show_admin_menu(chat_id, user_id=None):
     """Afișează meniul de administrare cu butoane inline."""
     markup = types.InlineKeyboardMarkup(row_width=2)
     
-    list_btn = types.InlineKeyboardButton("📋 Listă URL-uri", callback_data="listurl")
+    list_btn = types.InlineKeyboardButton("📋 Căutările mele", callback_data="listurl")
     add_btn = types.InlineKeyboardButton("➕ Adaugă Căutare", callback_data="addurl")
     del_btn = types.InlineKeyboardButton("🗑️ Șterge URL", callback_data="delurl")
-    stats_btn = types.InlineKeyboardButton("📊 Statistici DB", callback_data="dbstats")
+    buttons = [list_btn, add_btn, del_btn]
+    if user_id is None or is_admin(user_id):
+        buttons.append(types.InlineKeyboardButton("📊 Statistici DB", callback_data="dbstats"))
     
-    markup.add(list_btn, add_btn, del_btn, stats_btn)
+    markup.add(*buttons)
     bot.send_message(chat_id, "⚙️ Gestiune Monitorizare OLX.ro:", reply_markup=markup)
 
 def add_url_from_reply(message):
     """Procesează URL-ul primit prin funcția Reply."""
+    if not is_allowed_user(message.from_user.id): return
     if not message.text:
         bot.reply_to(message, "❌ Te rog trimite un link valid.")
         return
     process_new_url(message, message.text.strip())
 
 def process_new_url(message, url):
-    """Validează și salvează un nou link de căutare OLX."""
+    """Validează și abonează chat-ul curent la un nou link de căutare OLX."""
     if not (url.startswith('http://') or url.startswith('https://')):
         bot.reply_to(message, "❌ Format invalid. Link-ul trebuie să înceapă cu http:// sau https://")
         return
@@ -732,95 +2008,117 @@ def process_new_url(message, url):
         bot.reply_to(message, "⚠️ Doar link-urile de pe OLX.ro sunt suportate în această versiune.")
         return
     
-    urls = load_urls()
-    if url in urls:
+    success, already_subscribed = add_subscription(message.chat.id, url)
+    if already_subscribed:
         bot.reply_to(message, "ℹ️ Acest URL este deja monitorizat.")
         return
     
-    urls.append(url)
-    if save_urls(urls):
+    if success:
         bot.reply_to(message, "✅ Căutare adăugată cu succes! Botul va începe scanarea.")
-        show_admin_menu(message.chat.id)
+        show_admin_menu(message.chat.id, message.from_user.id)
     else:
         bot.reply_to(message, "❌ Eroare la salvarea fișierului de configurare.")
 
+def send_url_list(chat_id):
+    """Trimite lista căutărilor la care este abonat chat-ul."""
+    urls = get_urls_for_chat(chat_id)
+    if not urls:
+        bot.send_message(chat_id, "ℹ️ Nu monitorizezi niciun link momentan.")
+        return
+    
+    response = "📋 URL-uri monitorizate active:\n\n"
+    for i, url in enumerate(urls):
+        response += f"{i+1}. {url}\n"
+    bot.send_message(chat_id, response)
+
+def send_delete_menu(chat_id):
+    """Trimite butoanele de ștergere pentru căutările chat-ului."""
+    urls = get_urls_for_chat(chat_id)
+    if not urls:
+        bot.send_message(chat_id, "ℹ️ Nu există URL-uri de șters.")
+        return
+    
+    markup = types.InlineKeyboardMarkup(row_width=1)
+    for i, url in enumerate(urls):
+        display_name = url[:45] + "..." if len(url) > 45 else url
+        btn = types.InlineKeyboardButton(f"🗑️ {i+1}. {display_name}", callback_data=f"del_{i}")
+        markup.add(btn)
+    bot.send_message(chat_id, "Selectează URL-ul pe care vrei să îl elimini:", reply_markup=markup)
+
+def send_db_stats(chat_id):
+    """Trimite statisticile bazei de date."""
+    stats = get_ad_stats()
+    response = (
+        "📊 Statistici Sistem:\n\n"
+        f"Total anunțuri în istoric: {stats['total_ads']}\n"
+        f"Anunțuri noi (24h): {stats.get('last_24h', 0)}\n"
+        f"În curs de trimitere: {stats.get('unsent_ads', 0)}\n"
+        f"Căutări unice scanate: {len(load_urls())}\n"
+        f"Ultima curățenie: {stats['last_cleanup']}\n"
+    )
+    bot.send_message(chat_id, response)
+
 # --- HANDLERE COMENZI BOT ---
 
 @bot.message_handler(commands=['start', 'help'])
 def send_welcome(message):
     """Mesaj de bun venit și instrucțiuni."""
-    if is_admin(message.from_user.id):
+    if is_allowed_user(message.from_user.id):
         welcome_text = (
             "👋 Salut! Sunt botul tău de monitorizare OLX.ro.\n\n"
             "Comenzi disponibile:\n"
             "/addurl - Adaugă o căutare nouă\n"
             "/listurl - Vezi ce cauți acum\n"
             "/delurl - Șterge o căutare\n"
-            "/dbstats - Statistici bază de date\n"
-            "/cleanup - Curățare manuală DB\n"
             "/menu - Deschide meniul rapid"
         )
+        if is_admin(message.from_user.id):
+            welcome_text += (
+                "\n/dbstats - Statistici bază de date\n"
+                "/tuning - Decizii auto-tuning scanare\n"
+                "/cleanup - Curățare manuală DB"
+            )
         bot.reply_to(message, welcome_text)
-        show_admin_menu(message.chat.id)
+        show_admin_menu(message.chat.id, message.from_user.id)
     else:
-        bot.reply_to(message, "⛔ Acces interzis. Doar adminii pot folosi acest bot.")
+        bot.reply_to(message, "⛔ Acces interzis. Doar membrii echipei pot folosi acest bot.")
 
 @bot.message_handler(commands=['menu'])
 def menu_command(message):
-    if is_admin(message.from_user.id):
-        show_admin_menu(message.chat.id)
+    if is_allowed_user(message.from_user.id):
+        show_admin_menu(message.chat.id, message.from_user.id)
 
 @bot.message_handler(commands=['addurl'])
 def add_url(message):
-    if not is_admin(message.from_user.id): return
+    if not is_allowed_user(message.from_user.id): return
     
     parts = message.text.split(' ', 1)
     if len(parts) < 2:
         markup = types.ForceReply(selective=True)
-        bot.reply_to(message, "Trimite link-ul de căutare OLX.ro:", reply_markup=markup)
+        msg = bot.reply_to(message, "Trimite link-ul de căutare OLX.ro:", reply_markup=markup)
+        bot.register_for_reply(msg, add_url_from_reply)
         return
     process_new_url(message, parts[1].strip())
 
 @bot.message_handler(commands=['listurl'])
 def list_urls(message):
-    if not is_admin(message.from_user.id): return
-    urls = load_urls()
-    if not urls:
-        bot.reply_to(message, "ℹ️ Nu monitorizezi niciun link momentan.")
-        return
-    
-    response = "📋 URL-uri monitorizate active:\n\n"
-    for i, url in enumerate(urls):
-        response += f"{i+1}. {url}\n"
-    bot.reply_to(message, response)
+    if not is_allowed_user(message.from_user.id): return
+    send_url_list(message.chat.id)
 
 @bot.message_handler(commands=['delurl'])
 def delete_url(message):
-    if not is_admin(message.from_user.id): return
-    urls = load_urls()
-    if not urls:
-        bot.reply_to(message, "ℹ️ Nu există URL-uri de șters.")
-        return
-    
-    markup = types.InlineKeyboardMarkup(row_width=1)
-    for i, url in enumerate(urls):
-        display_name = url[:45] + "..." if len(url) > 45 else url
-        btn = types.InlineKeyboardButton(f"🗑️ {i+1}. {display_name}", callback_data=f"del_{i}")
-        markup.add(btn)
-    bot.reply_to(message, "Selectează URL-ul pe care vrei să îl elimini:", reply_markup=markup)
+    if not is_allowed_user(message.from_user.id): return
+    send_delete_menu(message.chat.id)
 
 @bot.message_handler(commands=['dbstats'])
 def db_stats_command(message):
     if not is_admin(message.from_user.id): return
-    stats = get_ad_stats()
-    response = (
-        "📊 Statistici Sistem:\n\n"
-        f"Total anunțuri în istoric: {stats['total_ads']}\n"
-        f"Anunțuri noi (24h): {stats.get('last_24h', 0)}\n"
-        f"În curs de trimitere: {stats.get('unsent_ads', 0)}\n"
-        f"Ultima curățenie: {stats['last_cleanup']}\n"
-    )
-    bot.reply_to(message, response)
+    send_db_stats(message.chat.id)
+
+@bot.message_handler(commands=['tuning'])
+def tuning_command(message):
+    if not is_admin(message.from_user.id): return
+    bot.reply_to(message, format_tuning_report())
 
 @bot.message_handler(commands=['cleanup'])
 def cleanup_command(message):
@@ -834,76 +2132,260 @@ def cleanup_command(message):
 
 @bot.callback_query_handler(func=lambda call: True)
 def callback_handler(call):
-    if not is_admin(call.from_user.id):
+    if not is_allowed_user(call.from_user.id):
         bot.answer_callback_query(call.id, "⛔ Acces refuzat.")
         return
+
+    # Mesajul cu butoane e trimis de bot, deci chat-ul vine din mesaj, iar userul din call
+    chat_id = call.message.chat.id
         
     if call.data == "listurl":
         bot.answer_callback_query(call.id)
-        list_urls(call.message)
+        send_url_list(chat_id)
     elif call.data == "addurl":
         bot.answer_callback_query(call.id)
         markup = types.ForceReply(selective=True)
-        msg = bot.send_message(call.message.chat.id, "Lipește link-ul OLX.ro aici:", reply_markup=markup)
+        msg = bot.send_message(chat_id, "Lipește link-ul OLX.ro aici:", reply_markup=markup)
         bot.register_for_reply(msg, add_url_from_reply)
     elif call.data == "delurl":
         bot.answer_callback_query(call.id)
-        delete_url(call.message)
+        send_delete_menu(chat_id)
     elif call.data == "dbstats":
+        if not is_admin(call.from_user.id):
+            bot.answer_callback_query(call.id, "⛔ Doar pentru admini.")
+            return
         bot.answer_callback_query(call.id)
-        db_stats_command(call.message)
+        send_db_stats(chat_id)
     elif call.data.startswith("del_"):
         try:
             index = int(call.data.split("_")[1])
-            urls = load_urls()
+            urls = get_urls_for_chat(chat_id)
             if 0 <= index < len(urls):
-                removed = urls.pop(index)
-                if save_urls(urls):
+                removed = urls[index]
+                if remove_subscription(chat_id, removed):
                     bot.answer_callback_query(call.id, "Șters!")
-                    bot.send_message(call.message.chat.id, f"🗑️ Am eliminat: {removed}")
+                    bot.send_message(chat_id, f"🗑️ Am eliminat: {removed}")
         except:
             bot.answer_callback_query(call.id, "Eroare la ștergere.")
 
 def bot_polling_thread():
     """Funcție de polling pentru Telegram, rulează separat de scaner."""
+    try:
+        # Un webhook rămas activ blochează getUpdates
+        bot.remove_webhook()
+    except Exception as e:
+        logging.warning(f"Nu am putut șterge webhook-ul vechi: {e}")
+
     while True:
         try:
-            bot.polling(none_stop=True, interval=2)
+            # Long polling: răspunsul vine imediat ce apare un update, fără pauze fixe
+            bot.polling(none_stop=True, interval=0, timeout=POLLING_TIMEOUT, long_polling_timeout=POLLING_TIMEOUT)
         except Exception as e:
             logging.error(f"Eroare polling bot: {e}")
             time.sleep(5)
 
+def get_webhook_path():
+    """Calea pe care ascultă serverul local (aceeași ca în WEBHOOK_URL)."""
+    return urlparse(WEBHOOK_URL).path or "/"
+
+def dispatch_webhook_update(body):
+    """Transformă corpul JSON primit de la Telegram în Update și îl trimite handlerelor."""
+    update = types.Update.de_json(body.decode('utf-8'))
+    if update is None:
+        return False
+    # Cu threaded=True (implicit), botul pune handlerele în worker pool-ul său
+    bot.process_new_updates([update])
+    return True
+
+def create_webhook_server(host=WEBHOOK_LISTEN, port=WEBHOOK_PORT):
+    """Construiește serverul HTTP care primește update-urile Telegram."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    webhook_path = get_webhook_path()
+
+    class WebhookHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if self.path != webhook_path:
+                self.send_error(404)
+                return
+            if self.headers.get('X-Telegram-Bot-Api-Secret-Token') != WEBHOOK_SECRET:
+                self.send_error(403)
+                return
+
+            length = int(self.headers.get('Content-Length') or 0)
+            if length <= 0 or length > WEBHOOK_MAX_BODY:
+                self.send_error(400)
+                return
+            body = self.rfile.read(length)
+
+            # Răspundem imediat; Telegram nu trebuie să aștepte execuția handlerelor
+            self.send_response(200)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+            try:
+                dispatch_webhook_update(body)
+            except Exception as e:
+                logging.error(f"Eroare procesare update webhook: {e}")
+
+        def log_message(self, format, *args):
+            # Fără spam în bot.log pentru fiecare request
+            pass
+
+    server = ThreadingHTTPServer((host, port), WebhookHandler)
+    server.daemon_threads = True
+    return server
+
+def bot_webhook_thread():
+    """Mod webhook: server HTTP local + înregistrare URL la Telegram. Cade pe polling la eroare."""
+    try:
+        server = create_webhook_server()
+        # Secretul e mereu setat (generat la pornire dacă lipsește din .env)
+        bot.set_webhook(url=WEBHOOK_URL, secret_token=WEBHOOK_SECRET)
+        logging.info(f"🌐 Webhook activ pe {WEBHOOK_LISTEN}:{WEBHOOK_PORT}{get_webhook_path()}")
+        server.serve_forever()
+    except Exception as e:
+        logging.error(f"Eroare webhook, revin la long polling: {e}")
+        bot_polling_thread()
+
+def start_bot_thread():
+    """Pornește botul în mod webhook (dacă e configurat) sau long polling."""
+    import threading
+    target = bot_webhook_thread if WEBHOOK_URL else bot_polling_thread
+    bot_thread = threading.Thread(target=target, daemon=True)
+    bot_thread.start()
+    return bot_thread
+
+# --- PORNIRE ---
+
+def record_startup_timing(name, seconds):
+    with startup_lock:
+        STARTUP_TIMINGS[name] = seconds
+
+def run_startup_phase(name, func):
+    """Rulează o fază de pornire și îi notează durata. Fazele opționale nu opresc botul."""
+    started = time.time()
+    try:
+        return func()
+    except Exception as e:
+        logging.warning(f"Faza de pornire '{name}' a eșuat: {e}")
+    finally:
+        record_startup_timing(name, time.time() - started)
+
+def start_background_phase(name, func):
+    """Pornește o fază de pornire necritică în fundal."""
+    thread = threading.Thread(target=run_startup_phase, args=(name, func), name=name, daemon=True)
+    thread.start()
+    return thread
+
+def warm_browser():
+    """Importă DrissionPage, curăță profilurile orfane și pornește o dată Chromium."""
+    load_browser_classes()
+    cleanup_profiles()
+    # Binarul Chromium și profilul ajung în cache-ul OS-ului înainte de scanările următoare
+    run_in_browser(lambda driver: True, "încălzire browser")
+
+def warm_database():
+    """Citește indexurile și rândurile recente ca primele interogări să nu aștepte după disc."""
+    load_subscriptions()
+    conn = sqlite3.connect(DB_FILE)
+    cursor = conn.cursor()
+    cursor.execute("SELECT name, value FROM ad_counters").fetchall()
+    cursor.execute("SELECT link, ad_id, sent_to_telegram FROM ads ORDER BY date_found DESC LIMIT ?", (WARM_DB_ROWS,)).fetchall()
+    cursor.execute("SELECT link, chat_id FROM ad_deliveries LIMIT ?", (WARM_DB_ROWS,)).fetchall()
+    conn.close()
+
+def warm_telegram():
+    """Deschide conexiunea către Bot API și trimite mesajele de pornire, fără să țină scanarea pe loc."""
+    bot.get_me()
+    urls = load_urls()
+    for chat_id in CHAT_IDS:
+        try:
+            msg = "🚀 Monitor pornire! Caut plăci video pe OLX.ro..." if urls else "🤖 Bot activ! Adaugă un URL pentru a începe scanarea."
+            bot.send_message(chat_id, msg)
+        except Exception as e:
+            logging.warning(f"Mesaj de pornire netrimis către {chat_id}: {e}")
+
+def log_startup_report(phase_threads=()):
+    """Scrie în log cât a durat fiecare fază de pornire.
+
+    Dacă unele faze din fundal încă rulează, scrie un al doilea raport când se termină
+    (cel mult STARTUP_REPORT_WAIT_SECONDS).
+    """
+    with startup_lock:
+        timings = dict(STARTUP_TIMINGS)
+    lines = [f"   {name}: {seconds:.2f}s" for name, seconds in timings.items()]
+    pending = [thread for thread in phase_threads if thread.is_alive()]
+    if pending:
+        lines.append(f"   încă în lucru: {', '.join(thread.name for thread in pending)}")
+    logging.info("⏱️ Raport pornire:\n" + "\n".join(lines))
+    if not pending:
+        return
+
+    def wait_and_report():
+        deadline = time.time() + STARTUP_REPORT_WAIT_SECONDS
+        for thread in pending:
+            thread.join(timeout=max(0, deadline - time.time()))
+        log_startup_report([thread for thread in pending if thread.is_alive()])
+
+    threading.Thread(target=wait_and_report, daemon=True).start()
+
 # --- FUNCTIA PRINCIPALA ---
 
 def main():
     try:
-        os.makedirs('./profiles', exist_ok=True)
+        record_startup_timing('importuri', time.time() - STARTUP_STARTED)
+        phase_started = time.time()
+        os.makedirs(PROFILES_DIR, exist_ok=True)
         setup_logging()
+        # Singura fază critică: fără DB nu putem deduplica anunțurile
         init_database()
-        cleanup_old_ads()
+        record_startup_timing('logging + baza de date', time.time() - phase_started)
         
         # Lansăm botul într-un thread separat pentru a răspunde la comenzi în timp ce scanăm
-        import threading
-        bot_thread = threading.Thread(target=bot_polling_thread, daemon=True)
-        bot_thread.start()
-        
-        urls = load_urls()
-        for chat_id in CHAT_IDS:
-            try:
-                msg = "🚀 Monitor pornire! Caut plăci video pe OLX.ro..." if urls else "🤖 Bot activ! Adaugă un URL pentru a începe scanarea."
-                bot.send_message(chat_id, msg)
-            except: pass
+        start_bot_thread()
+        start_browser_watchdog()
+
+        # Încălzirile rulează în paralel cu primul ciclu, nu înaintea lui
+        phase_threads = [
+            start_background_phase('încălzire browser', warm_browser),
+            start_background_phase('încălzire DB', warm_database),
+            start_background_phase('sesiune Telegram + mesaje pornire', warm_telegram),
+        ]
         
         cycle_counter = 1
+        cleanup_checked = False
         while True:
             try:
                 start_time = time.time()
                 logging.info(f"--- Început Ciclu #{cycle_counter} ---")
+                if cycle_counter == 1:
+                    record_startup_timing('timp până la prima scanare', start_time - STARTUP_STARTED)
                 
                 # Verificăm toate link-urile
                 fresh_found = quick_check_all_urls()
                 
                 elapsed = time.time() - start_time
+
+                # Curățenia (DELETE + VACUUM) rulează între cicluri, pe bucla principală, și doar când
+                # nicio scanare nu mai scrie în DB: VACUUM ține un lock exclusiv pe toată baza
+                with active_browsers_lock:
+                    scans_running = bool(IN_FLIGHT_URLS)
+                if scans_running:
+                    logging.info("🧹 Cleanup DB amânat: încă rulează scanări din ciclul acesta.")
+                elif not cleanup_checked:
+                    # Prima verificare (după primul ciclu, nu înaintea lui) apare în raportul de pornire
+                    run_startup_phase('cleanup DB amânat', cleanup_old_ads)
+                    cleanup_checked = True
+                    if cycle_counter > 1:
+                        # Cleanup-ul a lipsit din primul raport: îl completăm acum
+                        log_startup_report()
+                else:
+                    cleanup_old_ads()
+
+                if cycle_counter == 1:
+                    record_startup_timing('primul ciclu', elapsed)
+                    log_startup_report(phase_threads)
                 
                 # Timp de așteptare adaptiv (mai rapid dacă găsim ceva nou)
                 wait_time = max(5, QUICK_CHECK_INTERVAL - elapsed) if fresh_found else max(10, MIN_INTERVAL - elapsed)
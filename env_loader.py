@@ -1,5 +1,6 @@
 # env_loader.py
 import os
+import secrets
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -7,9 +8,27 @@ load_dotenv()
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
 CHAT_IDS = os.getenv("CHAT_IDS", "").split(",")
 ADMIN_IDS = os.getenv("ADMIN_IDS", "").split(",")
+# Membrii echipei care își pot gestiona propriile căutări (adminii sunt incluși automat)
+USER_IDS = os.getenv("USER_IDS", "").split(",")
 DB_FILE = os.getenv("DB_FILE", "olx_ads.db")
 URLS_FILE = os.getenv("URLS_FILE", "tracked_urls.json")
 
 
 CHAT_IDS = [int(chat_id) for chat_id in CHAT_IDS if chat_id.strip()]
 ADMIN_IDS = [int(admin_id) for admin_id in ADMIN_IDS if admin_id.strip()]
+USER_IDS = [int(user_id) for user_id in USER_IDS if user_id.strip()]
+
+# Proxy-uri pentru scanare (opțional), separate prin virgulă, ex: http://10.0.0.2:3128
+PROXIES = [proxy.strip() for proxy in os.getenv("PROXIES", "").split(",") if proxy.strip()]
+
+# Webhook (opțional). Dacă WEBHOOK_URL e gol, botul folosește long polling.
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+# Implicit doar local: în față stă un reverse proxy cu TLS
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "127.0.0.1")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+if WEBHOOK_URL and not WEBHOOK_SECRET:
+    # Fără secret, oricine ajunge la port ar putea trimite update-uri false în numele unui admin
+    WEBHOOK_SECRET = secrets.token_urlsafe(32)
+# Bot API alternativ (server local sau fake pentru teste), ex: http://127.0.0.1:8081
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "")